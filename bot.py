@@ -1,24 +1,42 @@
+import io
 import os
 import csv
 import json
 import random
+import asyncio
 import requests
+import time
 import tempfile
 import shutil
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 
+import aiohttp
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+
+from cards import CardRenderer, hero_asset_path
+from guildconfig import ConfigError, GuildConfigStore, emoji_key
+from heroindex import HeroIndex
+from teams import PLAYERS, balance_teams
+from throttle import CommandThrottle, Throttled, throttled
+from queues import QueueManager
 
 # =======================
 # Configuration Constants
 # =======================
 
+# Used to report time-to-ready and time-to-first-command
+STARTED_AT = time.perf_counter()
+
 # Reads the token from an environment variable, falling back to a placeholder string
 TOKEN = os.getenv("DISCORD_BOT_TOKEN", "YOUR_BOT_TOKEN_HERE")
 
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID", "YOUR_GUILD_ID_HERE"))
 
+# OpenDota API base URL (overridable so soak.py can point it at a local server)
+OPENDOTA_API_URL = os.getenv("DOTABOT_OPENDOTA_API", "https://api.opendota.com/api")
+
 # Role IDs (example IDs)
 ROLE_DEFAULT_ID = 1078825365306355712
 ROLE_IR_ID = 1275633243605172355
@@ -51,6 +69,17 @@ EMOJI_UNDER  = "⬇️"  # lower guess
 DAILY_REWARD = 25
 DAILY_INTERVAL = timedelta(hours=23)
 
+# Throttling for commands that cost several REST calls: tokens per second and burst size
+USER_COMMAND_RATE = 1 / 10
+USER_COMMAND_BURST = 3
+GUILD_COMMAND_RATE = 1.0
+GUILD_COMMAND_BURST = 10
+THROTTLE_MAX_KEYS = 50000
+
+# Open queues are closed automatically after this many seconds
+QUEUE_TIMEOUT = 2 * 60 * 60
+QUEUE_TICK_SECONDS = 1.0
+
 # -----------------------
 # File Cache Directory in OS Temp
 # -----------------------
@@ -59,6 +88,16 @@ os.makedirs(CACHE_DIR, exist_ok=True)
 
 CURRENCY_FILE = os.path.join(CACHE_DIR, "currency.csv")
 HERO_STATS_FILE = os.path.join(CACHE_DIR, "heroStats.json")
+WARM_STATE_FILE = os.path.join(CACHE_DIR, "warm_state.json")
+GUILD_CONFIG_FILE = os.path.join(CACHE_DIR, "guild_config.json")
+AVATAR_DIR = os.path.join(CACHE_DIR, "avatars")
+os.makedirs(AVATAR_DIR, exist_ok=True)
+# Oldest avatar files beyond this many are deleted after each download
+AVATAR_CACHE_LIMIT = 500
+
+# Image cards for !top and Over/Under (needs Pillow); otherwise plain text embeds
+IMAGE_CARDS = os.getenv("DOTABOT_IMAGE_CARDS", "0") == "1" and CardRenderer.available()
+card_renderer = CardRenderer()
 
 # If heroStats.json not found, try local or fetch from the API
 if not os.path.exists(HERO_STATS_FILE):
@@ -68,7 +107,7 @@ if not os.path.exists(HERO_STATS_FILE):
     else:
         print("heroStats.json not found locally. Fetching from OpenDota API...")
         try:
-            resp = requests.get("https://api.opendota.com/api/heroStats", timeout=10)
+            resp = requests.get(f"{OPENDOTA_API_URL}/heroStats", timeout=10)
             if resp.status_code == 200:
                 with open(HERO_STATS_FILE, "w", encoding="utf-8") as f:
                     json.dump(resp.json(), f)
@@ -80,27 +119,51 @@ if not os.path.exists(HERO_STATS_FILE):
 # =======================
 # Load Hero Data
 # =======================
-try:
-    with open(HERO_STATS_FILE, "r", encoding="utf-8") as f:
-        heroes_data = json.load(f)
-except Exception as e:
-    print("Error loading heroStats.json:", e)
-    heroes_data = []
+def load_hero_data():
+    """
+    Loads heroStats.json and rebuilds hero_dict and hero_index.
+    Everything is built first and swapped in together, so a refresh
+    never exposes a half-built index to running commands.
+    """
+    global heroes_data, hero_dict, hero_index
+    try:
+        with open(HERO_STATS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print("Error loading heroStats.json:", e)
+        data = []
+
+    # Map hero ID -> localized_name
+    new_dict = {h["id"]: h.get("localized_name", f"HeroID_{h['id']}") for h in data}
+    new_index = HeroIndex(data)
+    heroes_data, hero_dict, hero_index = data, new_dict, new_index
 
-# Map hero ID -> localized_name
-hero_dict = {h["id"]: h.get("localized_name", f"HeroID_{h['id']}") for h in heroes_data}
 
 # =======================
 # Public Matches (Trivias)
 # =======================
 match_cache = []
 used_match_ids = set()
+# Backstop for used_match_ids when there is no cached batch to trim against
+USED_MATCH_IDS_LIMIT = 1000
+
+def trim_used_match_ids():
+    """
+    Forgets used ids that publicMatches can no longer return: anything older
+    than the oldest cached match, and all but the newest USED_MATCH_IDS_LIMIT.
+    """
+    global used_match_ids
+    if match_cache:
+        oldest = min(m["match_id"] for m in match_cache)
+        used_match_ids = {i for i in used_match_ids if i >= oldest}
+    if len(used_match_ids) > USED_MATCH_IDS_LIMIT:
+        used_match_ids = set(sorted(used_match_ids)[-USED_MATCH_IDS_LIMIT:])
 
 def fetch_matches():
     """Fetch public matches from OpenDota and store only 5v5 matches in match_cache."""
     global match_cache
     try:
-        url = "https://www.opendota.com/api/publicMatches"
+        url = f"{OPENDOTA_API_URL}/publicMatches"
         resp = requests.get(url, timeout=10)
         if resp.status_code == 200:
             all_matches = resp.json()
@@ -116,6 +179,7 @@ def fetch_matches():
                 ):
                     filtered.append(m)
             match_cache = filtered
+            trim_used_match_ids()
     except Exception as e:
         print("Error fetching matches:", e)
 
@@ -132,6 +196,61 @@ def get_next_match():
         return m
     return None
 
+# =======================
+# Warm State Snapshot
+# =======================
+# Bump when the snapshot layout changes; older snapshots are ignored
+WARM_STATE_VERSION = 1
+WARM_STATE_INTERVAL_MINUTES = 10
+
+def save_warm_state():
+    """
+    Writes hero data and its index, the prefetched matches and the used
+    match ids to a single file, swapped in atomically.
+    """
+    trim_used_match_ids()
+    state = {
+        "version": WARM_STATE_VERSION,
+        "hero_stats_mtime": os.path.getmtime(HERO_STATS_FILE),
+        "heroes_data": heroes_data,
+        "hero_index": hero_index.to_state(),
+        "match_cache": match_cache,
+        "used_match_ids": list(used_match_ids),
+    }
+    tmp_path = WARM_STATE_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, WARM_STATE_FILE)
+
+def load_warm_state():
+    """
+    Restores the caches from the snapshot in one read. Returns False if there
+    is no usable snapshot (missing, other version, or heroStats.json changed).
+    """
+    global heroes_data, hero_dict, hero_index, match_cache, used_match_ids
+    try:
+        with open(WARM_STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if state.get("version") != WARM_STATE_VERSION:
+        return False
+    if state.get("hero_stats_mtime") != os.path.getmtime(HERO_STATS_FILE):
+        return False
+
+    data = state["heroes_data"]
+    heroes_data = data
+    hero_dict = {h["id"]: h.get("localized_name", f"HeroID_{h['id']}") for h in data}
+    hero_index = HeroIndex(data, state["hero_index"])
+    match_cache = state["match_cache"]
+    used_match_ids = set(state["used_match_ids"])
+    return True
+
+STARTUP_MODE = "warm" if load_warm_state() else "cold"
+if STARTUP_MODE == "cold":
+    load_hero_data()
+first_command_served = False
+
 # =======================
 # CSV Data (MMR)
 # =======================
@@ -160,44 +279,169 @@ def save_currency_data(data):
                 "last_daily": record["last_daily"]
             })
 
+def apply_currency_changes(changes):
+    """
+    Applies {user_id: delta} with a single load and save.
+    Returns {user_id: new balance}.
+    """
+    data = load_currency_data()
+    balances = {}
+    for uid, delta in changes.items():
+        record = data.get(uid, {"currency": 0, "last_daily": "none"})
+        record["currency"] += delta
+        data[uid] = record
+        balances[uid] = record["currency"]
+    save_currency_data(data)
+    return balances
+
 # =======================
 # Helper / Utility
 # =======================
 def get_sender_name(ctx):
     return ctx.author.nick if ctx.author.nick else ctx.author.name
 
-async def send_queue_embed(ctx, title_template, emoji, role_obj, color=discord.Color.purple()):
+async def send_queue_embed(ctx, title_template, mode, role_obj, color=discord.Color.purple()):
+    settings = guild_configs.get(ctx.guild.id).modes.get(mode)
+    if not settings or not settings["enabled"]:
+        await ctx.send(f"The `{mode}` queue is disabled on this server.")
+        return
+    emoji = settings["emoji"]
+
     sender = get_sender_name(ctx)
     embed_title = title_template.format(sender=sender)
     embed = discord.Embed(title=embed_title, description="React below to join", color=color)
     msg = await ctx.send(embed=embed)
+    queue_manager.open(
+        msg.id, msg.channel.id, ctx.guild.id, mode, embed_title, ctx.author.id, settings["threshold"]
+    )
     await msg.add_reaction(emoji)
     await msg.add_reaction(EMOJI_CANCEL)
     if role_obj:
         await ctx.send(role_obj.mention)
 
-async def send_reply_msg(header_msg, reaction):
+# user_id -> set of user_ids that want to be on the same inhouse team (see !party)
+inhouse_parties = {}
+
+def add_balanced_teams(embed, users):
+    """
+    Adds Radiant/Dire fields to `embed`, balancing the players' stored MMR
+    and keeping !party groups together when possible.
+    """
+    data = load_currency_data()
+    ratings = [data.get(str(u.id), {"currency": 0})["currency"] for u in users]
+    slot_of = {u.id: i for i, u in enumerate(users)}
+    parties = [
+        [slot_of[uid] for uid in {user.id} | inhouse_parties.get(user.id, set()) if uid in slot_of]
+        for user in users
+    ]
+
+    result = balance_teams(ratings, parties) or balance_teams(ratings)
+    radiant, dire, diff = result
+    for name, slots in (("Radiant", radiant), ("Dire", dire)):
+        total = sum(ratings[i] for i in slots)
+        lines = "\n".join(f"{users[i].name} ({ratings[i]})" for i in slots)
+        embed.add_field(name=f"{name} — {total} MMR", value=lines, inline=True)
+    embed.set_footer(text=f"MMR difference: {diff}")
+
+async def send_reply_msg(header_msg, reaction, balance=False):
     embed = discord.Embed(title=header_msg, color=discord.Color.teal())
     participants = []
     async for user in reaction.users():
         if not user.bot:
-            participants.append(user.name)
+            participants.append(user)
     if participants:
-        embed.add_field(name="Participants:", value=", ".join(participants), inline=True)
+        embed.add_field(name="Participants:", value=", ".join(u.name for u in participants), inline=True)
     else:
         embed.add_field(name="Participants:", value="None", inline=True)
+    if balance and len(participants) == PLAYERS:
+        add_balanced_teams(embed, participants)
     await reaction.message.reply(embed=embed)
 
-reaction_thresholds = {
-    "🏆": (6, "🏆 Battle Cup 🏆"),
-    "⚔️": (6, "⚔️ Queue ⚔️"),
-    "📈": (6, "📈 Ranked 📈"),
-    "💃": (3, "💃 1v1 Mid 💃"),
-    "⏩": (6, "⏩ Turbo ⏩"),
-    "🏠": (11, "🏠 Inhouse 🏠"),
-    "🔒": (7, "🔒 Deadlock 🔒")
+# Avatar keys being downloaded in the background (see get_avatar_path)
+avatar_fetches = {}
+
+def prune_avatar_dir():
+    entries = sorted(os.scandir(AVATAR_DIR), key=lambda e: e.stat().st_mtime)
+    for entry in entries[:max(0, len(entries) - AVATAR_CACHE_LIMIT)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+async def fetch_avatar(avatar, path):
+    tmp_path = path + ".tmp"
+    try:
+        await avatar.replace(format="png", size=64).save(tmp_path)
+        os.replace(tmp_path, path)
+        await asyncio.to_thread(prune_avatar_dir)
+    except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError, OSError):
+        metrics["avatar_fetch_failed"] += 1
+    finally:
+        avatar_fetches.pop(avatar.key, None)
+
+def get_avatar_path(member):
+    """
+    Returns the member's avatar if it is already on disk, else None. Missing
+    avatars are downloaded in the background for later cards, so rendering
+    never waits on the CDN.
+    """
+    avatar = member.display_avatar
+    path = os.path.join(AVATAR_DIR, f"{avatar.key}.png")
+    if os.path.exists(path):
+        return path
+    if avatar.key not in avatar_fetches:
+        avatar_fetches[avatar.key] = asyncio.create_task(fetch_avatar(avatar, path))
+    return None
+
+async def render_card(kind, *args):
+    """
+    Renders a card, or returns None on any failure so callers fall back to a text embed.
+    """
+    try:
+        return await card_renderer.render(kind, *args)
+    except Exception as e:
+        metrics["card_render_failed"] += 1
+        print(f"Card render failed ({kind}): {e!r}")
+        return None
+
+# Queue modes every guild starts with; admins can change them per guild with !config
+DEFAULT_QUEUE_MODES = {
+    "battlecup": {"emoji": EMOJI_BC,     "threshold": 6,  "header": "🏆 Battle Cup 🏆", "enabled": True},
+    "queue":     {"emoji": EMOJI_QUEUE,  "threshold": 6,  "header": "⚔️ Queue ⚔️",       "enabled": True},
+    "ranked":    {"emoji": EMOJI_RANKED, "threshold": 6,  "header": "📈 Ranked 📈",      "enabled": True},
+    "mid":       {"emoji": EMOJI_MID,    "threshold": 3,  "header": "💃 1v1 Mid 💃",     "enabled": True},
+    "turbo":     {"emoji": EMOJI_TURBO,  "threshold": 6,  "header": "⏩ Turbo ⏩",       "enabled": True},
+    "inhouse":   {"emoji": EMOJI_IH,     "threshold": 11, "header": "🏠 Inhouse 🏠",     "enabled": True},
+    "deadlock":  {"emoji": EMOJI_DL,     "threshold": 7,  "header": "🔒 Deadlock 🔒",    "enabled": True},
+    "immortal":  {"emoji": EMOJI_IR,     "threshold": 6,  "header": f"{EMOJI_IR} Immortal Ranked {EMOJI_IR}", "enabled": True},
 }
 
+guild_configs = GuildConfigStore(GUILD_CONFIG_FILE, DAILY_REWARD, DEFAULT_QUEUE_MODES, reserved_emoji=[EMOJI_CANCEL])
+
+queue_manager = QueueManager(QUEUE_TIMEOUT, tick_seconds=QUEUE_TICK_SECONDS)
+
+# Process-wide counters, shown by !metrics
+metrics = Counter()
+
+command_throttle = CommandThrottle(
+    USER_COMMAND_RATE, USER_COMMAND_BURST,
+    GUILD_COMMAND_RATE, GUILD_COMMAND_BURST,
+    max_keys=THROTTLE_MAX_KEYS
+)
+
+async def close_queue_message(entry, reason):
+    """
+    Edits a closed queue's embed so it no longer invites reactions.
+    """
+    channel = bot.get_channel(entry.channel_id)
+    if channel is None:
+        return
+    embed = discord.Embed(title=entry.title, description=f"This queue has {reason}.", color=discord.Color.dark_grey())
+    try:
+        await channel.get_partial_message(entry.message_id).edit(embed=embed)
+    except discord.HTTPException:
+        pass
+
 # =======================
 # Bot Initialization
 # =======================
@@ -216,23 +460,68 @@ async def on_ready():
         return
     print(f"Connected to guild: {guild.name} (id: {guild.id})")
     print(f"Logged in as: {bot.user}")
+    print(f"Ready {time.perf_counter() - STARTED_AT:.2f}s after start ({STARTUP_MODE} caches)")
+    if not expire_queues.is_running():
+        expire_queues.start()
+    if not snapshot_warm_state.is_running():
+        snapshot_warm_state.start()
+
+@bot.event
+async def on_command_error(ctx, error):
+    # Shed commands are dropped silently; replying would spend the REST calls we are saving
+    if isinstance(error, Throttled):
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
+
+@bot.event
+async def on_command_completion(ctx):
+    global first_command_served
+    if not first_command_served:
+        first_command_served = True
+        print(f"First command served {time.perf_counter() - STARTED_AT:.2f}s after start ({STARTUP_MODE} caches)")
+
+@tasks.loop(minutes=WARM_STATE_INTERVAL_MINUTES)
+async def snapshot_warm_state():
+    try:
+        save_warm_state()
+    except OSError as e:
+        print("Error saving warm state:", e)
+
+@tasks.loop(seconds=QUEUE_TICK_SECONDS)
+async def expire_queues():
+    for entry in queue_manager.tick():
+        await close_queue_message(entry, "expired")
 
 @bot.event
 async def on_reaction_add(reaction, user):
     if reaction.message.author.id != bot.user.id or user.bot:
         return
 
-    threshold = None
-    header_title = None
+    if track_open_trivia_reaction(reaction, user, added=True):
+        return
 
-    # Check for Immortal custom emoji
-    if isinstance(reaction.emoji, discord.PartialEmoji) and (reaction.emoji.id == 1156278341096194098):
-        threshold, header_title = 6, "<:immortal:1156278341096194098> Immortal Ranked <:immortal:1156278341096194098>"
-    elif isinstance(reaction.emoji, str) and reaction.emoji in reaction_thresholds:
-        threshold, header_title = reaction_thresholds[reaction.emoji]
+    # Only queues that are still open react to anything
+    entry = queue_manager.get(reaction.message.id)
+    if entry is None:
+        return
+
+    if reaction.emoji == EMOJI_CANCEL:
+        if user.id == entry.creator_id or reaction.message.channel.permissions_for(user).manage_messages:
+            queue_manager.close(entry.message_id)
+            await close_queue_message(entry, "cancelled")
+        return
 
-    if threshold is not None and reaction.count == threshold:
-        await send_reply_msg(header_title, reaction)
+    # Unicode emoji and custom emoji ids share one index
+    config = guild_configs.get(entry.guild_id)
+    mode = config.emoji_modes.get(emoji_key(reaction.emoji))
+    if mode == entry.mode and reaction.count == entry.threshold:
+        await send_reply_msg(config.modes[mode]["header"], reaction, balance=(mode == "inhouse"))
+
+@bot.event
+async def on_reaction_remove(reaction, user):
+    if reaction.message.author.id != bot.user.id or user.bot:
+        return
+    track_open_trivia_reaction(reaction, user, added=False)
 
 # =======================
 # Commands
@@ -243,66 +532,171 @@ async def H(ctx):
         title="Dota Queue Bot Commands",
         description=(
             "!BC !battlecup      - Dota battlecup\n"
-            "!D !daily !d        - Claim your daily 25 MMR\n"
+            "!D !daily !d        - Claim your daily MMR\n"
             "!mmr !MMR           - Check your MMR\n"
             "!top !topmmr        - Show the top MMR holders\n"
             "!trivia !TRIVIA     - 50% match trivia, 50% hero Over/Under\n"
+            "!trivia open        - Trivia round the whole channel can answer\n"
+            "!hero <name>        - Hero stats (typos and abbreviations are fine)\n"
             "!DL !deadlock !dl   - Deadlock queue\n"
             "!IH !inhouse !ih    - Dota Inhouse\n"
+            "!party @friends     - Stay on one team in inhouses (!party to clear)\n"
             "!IR !immortalranked !ir - Dota immortal ranked Queue\n"
             "!M  !mid !m         - 1v1 mid\n"
             "!Q  !queue !q       - Dota queue\n"
             "!R  !ranked !r      - Dota ranked queue\n"
-            "!T  !turbo !t       - Dota Turbo"
+            "!T  !turbo !t       - Dota Turbo\n"
+            "!start <mode>       - Start any queue mode set up on this server\n"
+            "!config             - Server settings (admins)"
         ),
         color=discord.Color.green()
     )
     await ctx.send(embed=embed)
 
 @bot.command(aliases=['queue','q'])
+@throttled(command_throttle, metrics)
 async def Q(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
-    await send_queue_embed(ctx, "⚔️ Queue started by {sender} ⚔️", EMOJI_QUEUE, role)
+    await send_queue_embed(ctx, "⚔️ Queue started by {sender} ⚔️", "queue", role)
 
 @bot.command(aliases=['ranked','r'])
+@throttled(command_throttle, metrics)
 async def R(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
-    await send_queue_embed(ctx, "📈 Ranked Queue started by {sender} 📈", EMOJI_RANKED, role)
+    await send_queue_embed(ctx, "📈 Ranked Queue started by {sender} 📈", "ranked", role)
 
 @bot.command(aliases=['immortalranked','ir'])
+@throttled(command_throttle, metrics)
 async def IR(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_IR_ID)
-    await send_queue_embed(ctx, "<:immortal:1156278341096194098> Immortal Ranked Queue started by {sender} <:immortal:1156278341096194098>", EMOJI_IR, role)
+    await send_queue_embed(ctx, EMOJI_IR + " Immortal Ranked Queue started by {sender} " + EMOJI_IR, "immortal", role)
 
 @bot.command(aliases=['mid','m'])
+@throttled(command_throttle, metrics)
 async def M(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
-    await send_queue_embed(ctx, "💃 1v1 Mid started by {sender} 💃", EMOJI_MID, role)
+    await send_queue_embed(ctx, "💃 1v1 Mid started by {sender} 💃", "mid", role)
 
 @bot.command(aliases=['turbo','t'])
+@throttled(command_throttle, metrics)
 async def T(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
-    await send_queue_embed(ctx, "⏩ Turbo started by {sender} ⏩", EMOJI_TURBO, role)
+    await send_queue_embed(ctx, "⏩ Turbo started by {sender} ⏩", "turbo", role)
 
 @bot.command(aliases=["battlecup","bc"])
+@throttled(command_throttle, metrics)
 async def BC(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
-    await send_queue_embed(ctx, "🏆 Battle Cup started by {sender} 🏆", EMOJI_BC, role)
+    await send_queue_embed(ctx, "🏆 Battle Cup started by {sender} 🏆", "battlecup", role)
 
 @bot.command(aliases=["inhouse","ih"])
+@throttled(command_throttle, metrics)
 async def IH(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
-    await send_queue_embed(ctx, "🏠 Inhouse Started By {sender} 🏠", EMOJI_IH, role)
+    await send_queue_embed(ctx, "🏠 Inhouse Started By {sender} 🏠", "inhouse", role)
+
+@bot.command(aliases=['PARTY'])
+async def party(ctx, *members: discord.Member):
+    """
+    Asks the inhouse team generator to keep you with the mentioned players.
+    With no mentions, clears your party.
+    """
+    for uid in inhouse_parties.pop(ctx.author.id, set()):
+        others = inhouse_parties.get(uid)
+        if others is not None:
+            others.discard(ctx.author.id)
+            if not others:
+                del inhouse_parties[uid]
+    if not members:
+        await ctx.send(f"{ctx.author.mention}, your inhouse party was cleared.")
+        return
+
+    group = {ctx.author.id} | {m.id for m in members if not m.bot}
+    for uid in group:
+        inhouse_parties.setdefault(uid, set()).update(group - {uid})
+    names = ", ".join(m.display_name for m in members if not m.bot)
+    await ctx.send(f"{ctx.author.mention}, you'll be kept on the same inhouse team as {names}.")
 
 @bot.command(aliases=['deadlock','dl'])
+@throttled(command_throttle, metrics)
 async def DL(ctx):
     role = discord.utils.get(ctx.guild.roles, id=ROLE_DL_ID)
-    await send_queue_embed(ctx, "🔒 Deadlock Queue started by {sender} 🔒", EMOJI_DL, role)
+    await send_queue_embed(ctx, "🔒 Deadlock Queue started by {sender} 🔒", "deadlock", role)
+
+@bot.command(aliases=['START'])
+@throttled(command_throttle, metrics)
+async def start(ctx, mode=None):
+    """
+    Starts a queue for any mode configured on this server, including custom ones.
+    """
+    config = guild_configs.get(ctx.guild.id)
+    enabled = [name for name, settings in config.modes.items() if settings["enabled"]]
+    if not mode or mode.lower() not in enabled:
+        await ctx.send(f"Usage: `!start <mode>`. Modes: {', '.join(sorted(enabled))}")
+        return
+    mode = mode.lower()
+    role = discord.utils.get(ctx.guild.roles, id=ROLE_DEFAULT_ID)
+    # Headers are admin-supplied, so braces in them must not reach str.format
+    header = config.modes[mode]["header"].replace("{", "{{").replace("}", "}}")
+    await send_queue_embed(ctx, header + " started by {sender}", mode, role)
+
+@bot.command(aliases=['CONFIG'])
+@commands.has_permissions(administrator=True)
+async def config(ctx, setting=None, *args):
+    """
+    Shows or changes this server's settings (admins only):
+    !config reward <amount>
+    !config threshold <mode> <count>
+    !config enable|disable <mode>
+    !config addmode <name> <emoji> <threshold> [header...]
+    """
+    guild_id = ctx.guild.id
+    current = guild_configs.get(guild_id)
+    try:
+        if setting is None:
+            lines = [f"**Daily reward**: {current.daily_reward} MMR"]
+            for name, settings in sorted(current.modes.items()):
+                state = "on" if settings["enabled"] else "off"
+                lines.append(f"`{name}` {settings['emoji']} threshold {settings['threshold']} ({state})")
+            await ctx.send(embed=discord.Embed(
+                title="Server Config", description="\n".join(lines), color=discord.Color.dark_grey()
+            ))
+            return
+        setting = setting.lower()
+        if setting == "reward":
+            guild_configs.set_daily_reward(guild_id, int(args[0]))
+        elif setting == "threshold":
+            mode = args[0].lower()
+            if mode not in current.modes:
+                raise ValueError
+            guild_configs.set_mode(guild_id, mode, threshold=int(args[1]))
+        elif setting in ("enable", "disable"):
+            mode = args[0].lower()
+            if mode not in current.modes:
+                raise ValueError
+            guild_configs.set_mode(guild_id, mode, enabled=(setting == "enable"))
+        elif setting == "addmode":
+            name, emoji, threshold = args[0].lower(), args[1], int(args[2])
+            partial = discord.PartialEmoji.from_str(emoji)
+            if partial.id is not None and bot.get_emoji(partial.id) is None:
+                await ctx.send(f"I can't use {emoji}; custom emoji must be from a server I'm in.")
+                return
+            header = " ".join(args[3:]) or f"{emoji} {name.title()} {emoji}"
+            guild_configs.set_mode(guild_id, name, emoji=emoji, threshold=threshold, header=header, enabled=True)
+        else:
+            raise ValueError
+    except ConfigError as e:
+        await ctx.send(str(e))
+        return
+    except (IndexError, ValueError):
+        await ctx.send("Usage: `!config [reward <n> | threshold <mode> <n> | enable <mode> | disable <mode> | addmode <name> <emoji> <threshold> [header]]`")
+        return
+    await ctx.send("Server config updated.")
 
 @bot.command(aliases=['daily','d'])
 async def D(ctx):
     """
-    Claim your daily reward of 25 MMR.
+    Claim your daily reward (25 MMR unless the server changed it).
     The user can only claim once every 23 hours.
     Sends a :tormie: emoji on success.
     """
@@ -327,7 +721,8 @@ async def D(ctx):
                 eligible = True
 
     if eligible:
-        record["currency"] += DAILY_REWARD
+        # DMs have no guild, so they get the default reward
+        record["currency"] += guild_configs.get(ctx.guild.id).daily_reward if ctx.guild else DAILY_REWARD
         record["last_daily"] = now.isoformat()
         data[user_id] = record
         save_currency_data(data)
@@ -354,12 +749,27 @@ async def MMR(ctx):
     await ctx.send(f"{ctx.author.mention}, you have **{current} MMR** {EMOJI_TORMIE}")
 
 @bot.command(aliases=['topmmr','top'])
+@throttled(command_throttle, metrics)
 async def TOP(ctx):
     data = load_currency_data()
     sorted_data = sorted(data.items(), key=lambda x: x[1]["currency"], reverse=True)
     top_ten = sorted_data[:10]
     guild = ctx.guild
 
+    if IMAGE_CARDS:
+        rows = []
+        for i, (u_id, info) in enumerate(top_ten, start=1):
+            member = guild.get_member(int(u_id))
+            name = member.display_name if member else f"User ID {u_id}"
+            avatar_path = get_avatar_path(member) if member else None
+            rows.append((i, name, f"{info['currency']} MMR", avatar_path))
+        png = await render_card("leaderboard", "Top MMR Holders", rows)
+        if png is not None:
+            embed = discord.Embed(title="Top MMR Holders", color=discord.Color.gold())
+            embed.set_image(url="attachment://top.png")
+            await ctx.send(embed=embed, file=discord.File(io.BytesIO(png), filename="top.png"))
+            return
+
     desc = ""
     for i, (u_id, info) in enumerate(top_ten, start=1):
         member = guild.get_member(int(u_id))
@@ -369,6 +779,17 @@ async def TOP(ctx):
     embed = discord.Embed(title="Top MMR Holders", description=desc, color=discord.Color.gold())
     await ctx.send(embed=embed)
 
+@bot.command(name="metrics")
+@commands.has_permissions(administrator=True)
+async def show_metrics(ctx):
+    """
+    Shows this process's counters (admins only).
+    """
+    lines = [f"`{name}`: {value}" for name, value in sorted(metrics.items())]
+    lines.append(f"`throttle_tracked_keys`: {len(command_throttle.users) + len(command_throttle.guilds)}")
+    embed = discord.Embed(title="Metrics", description="\n".join(lines), color=discord.Color.dark_grey())
+    await ctx.send(embed=embed)
+
 # =======================
 # Over/Under Trivia
 # =======================
@@ -379,19 +800,24 @@ RELEVANT_STATS = [
     "attack_range", "attack_rate", "move_speed"
 ]
 
-async def do_hero_over_under_trivia(ctx):
+# Channel-wide rounds: everyone can answer until the deadline
+OPEN_TRIVIA_SECONDS = 30
+# message_id -> {"choices", "answers": {user_id: [emoji, ...]}, "double_down": {user_id}}
+# Each player's answers are their current choice reactions, oldest first; the last one counts
+open_trivia_rounds = {}
+
+async def build_hero_over_under_question():
     """
     1) Random hero from heroStats.
     2) Random stat from RELEVANT_STATS.
     3) Multiply real stat by ~0.8..1.2 => displayed_value
     4) Ask Over (⬆️) or Under (⬇️), plus Double Down (💰).
-    5) ±5 or ±10 MMR based on correctness + double down
-    6) Show hero image in the embed
+    5) Show hero image in the embed
+    Returns (question, error_message).
     """
     valid_heroes = [h for h in heroes_data if any(s in h for s in RELEVANT_STATS)]
     if not valid_heroes:
-        await ctx.send("No hero data available for Over/Under.")
-        return
+        return None, "No hero data available for Over/Under."
 
     hero = random.choice(valid_heroes)
     hero_name = hero.get("localized_name", "Unknown Hero")
@@ -403,14 +829,12 @@ async def do_hero_over_under_trivia(ctx):
 
     possible_stats = [s for s in RELEVANT_STATS if s in hero]
     if not possible_stats:
-        await ctx.send("No valid stats found for this hero.")
-        return
+        return None, "No valid stats found for this hero."
 
     chosen_stat = random.choice(possible_stats)
     real_value = hero[chosen_stat]
     if not isinstance(real_value, (int, float)):
-        await ctx.send("Picked a non-numeric stat. Try again.")
-        return
+        return None, "Picked a non-numeric stat. Try again."
 
     factor = random.uniform(0.8, 1.2)
     displayed_value = round(factor * real_value, 1)
@@ -422,7 +846,16 @@ async def do_hero_over_under_trivia(ctx):
         f"We show: **{displayed_value}**.\n\n"
         "Is the real value Over or Under that number?"
     )
-    if hero_img:
+    card_file = None
+    png = None
+    if IMAGE_CARDS:
+        png = await render_card(
+            "hero_stat", hero_name, chosen_stat, displayed_value, hero_asset_path(hero)
+        )
+    if png is not None:
+        card_file = discord.File(io.BytesIO(png), filename="hero.png")
+        embed.set_image(url="attachment://hero.png")
+    elif hero_img:
         embed.set_image(url=hero_img)
 
     embed.set_footer(text=(
@@ -431,72 +864,28 @@ async def do_hero_over_under_trivia(ctx):
         f"React {DOUBLE_DOWN} to double down (±10). Otherwise ±5."
     ))
 
-    trivia_msg = await ctx.send(embed=embed)
-    await trivia_msg.add_reaction(EMOJI_OVER)
-    await trivia_msg.add_reaction(EMOJI_UNDER)
-    await trivia_msg.add_reaction(DOUBLE_DOWN)
-
-    def check(reaction, user):
-        return (
-            user == ctx.author
-            and reaction.message.id == trivia_msg.id
-            and str(reaction.emoji) in [EMOJI_OVER, EMOJI_UNDER]
-        )
-
-    try:
-        reaction, user = await bot.wait_for("reaction_add", timeout=60.0, check=check)
-    except:
-        await ctx.send("You took too long to respond.")
-        return
-
-    user_guess_over = (str(reaction.emoji) == EMOJI_OVER)
-
-    double_down_triggered = False
-    updated_msg = await ctx.fetch_message(trivia_msg.id)
-    for r in updated_msg.reactions:
-        if str(r.emoji) == DOUBLE_DOWN:
-            async for reactor in r.users():
-                if reactor == ctx.author:
-                    double_down_triggered = True
-                    break
-
-    real_is_over = (real_value > displayed_value)
-    if user_guess_over == real_is_over:
-        change = 10 if double_down_triggered else 5
-        result_text = f"Correct! You gain {change} MMR."
-    else:
-        change = -10 if double_down_triggered else -5
-        result_text = f"Incorrect! You lose {abs(change)} MMR."
-
-    # Update MMR
-    user_id = str(ctx.author.id)
-    data = load_currency_data()
-    record = data.get(user_id, {"currency": 0, "last_daily": "none"})
-    record["currency"] += change
-    data[user_id] = record
-    save_currency_data(data)
-
     over_or_under = "over" if real_value > displayed_value else "under"
-    await ctx.send(
-        f"{ctx.author.mention} {result_text}\n"
-        f"The real value is **{real_value}**, which is **{over_or_under}** {displayed_value}.\n"
-        f"Your new MMR: **{record['currency']}**."
-    )
+    return {
+        "embed": embed,
+        "file": card_file,
+        "choices": [EMOJI_OVER, EMOJI_UNDER],
+        "correct": EMOJI_OVER if real_value > displayed_value else EMOJI_UNDER,
+        "reveal": f"The real value is **{real_value}**, which is **{over_or_under}** {displayed_value}.",
+    }, None
 
 # =======================
 # Match Trivia (No Images)
 # =======================
-async def do_match_trivia(ctx):
+async def build_match_question():
     """
     5v5 match from public matches.
     🟢 => Radiant, 🔴 => Dire, 💰 => Double Down
-    Correct => +5 or +10, Incorrect => -5 or -10
     (No hero images, only names.)
+    Returns (question, error_message).
     """
     match = get_next_match()
     if not match:
-        await ctx.send("No matches available right now. Try again later.")
-        return
+        return None, "No matches available right now. Try again later."
 
     rad_ids = match["radiant_team"]
     dire_ids = match["dire_team"]
@@ -514,16 +903,69 @@ async def do_match_trivia(ctx):
         f"React {DOUBLE_DOWN} to double down (±10) otherwise ±5."
     ))
 
-    trivia_msg = await ctx.send(embed=embed)
-    await trivia_msg.add_reaction(GREEN_CIRCLE)
-    await trivia_msg.add_reaction(RED_CIRCLE)
+    winner_str = "Radiant" if match["radiant_win"] else "Dire"
+    return {
+        "embed": embed,
+        "file": None,
+        "choices": [GREEN_CIRCLE, RED_CIRCLE],
+        "correct": GREEN_CIRCLE if match["radiant_win"] else RED_CIRCLE,
+        "reveal": f"The actual winner was **{winner_str}**.",
+    }, None
+
+# =======================
+# Hero Lookup
+# =======================
+@bot.command(aliases=['HERO'])
+async def hero(ctx, *, name=None):
+    """
+    Shows RELEVANT_STATS for a hero. Accepts typos and common
+    abbreviations (am, wr, shadow fiend, ...).
+    """
+    if not name:
+        await ctx.send("Usage: `!hero <name>`")
+        return
+
+    results = hero_index.search(name)
+    if not results:
+        await ctx.send(f"No hero matches **{name}**.")
+        return
+
+    found, score = results[0]
+    embed = discord.Embed(title=found.get("localized_name", "Unknown Hero"), color=discord.Color.blue())
+    for stat in RELEVANT_STATS:
+        if stat in found:
+            embed.add_field(name=stat, value=str(found[stat]), inline=True)
+    if "img" in found:
+        embed.set_thumbnail(url="https://cdn.cloudflare.steamstatic.com" + found["img"])
+    if score < 1.0 and len(results) > 1:
+        others = ", ".join(h.get("localized_name", "?") for h, _ in results[1:])
+        embed.set_footer(text=f"Did you mean: {others}?")
+    await ctx.send(embed=embed)
+
+# =======================
+# Trivia Rounds
+# =======================
+def trivia_points(correct, double_down):
+    """
+    Correct => +5 or +10, Incorrect => -5 or -10
+    """
+    points = 10 if double_down else 5
+    return points if correct else -points
+
+async def run_solo_trivia(ctx, question):
+    """
+    One player (the command author) answers within 60 seconds.
+    """
+    trivia_msg = await ctx.send(embed=question["embed"], file=question["file"])
+    for emoji in question["choices"]:
+        await trivia_msg.add_reaction(emoji)
     await trivia_msg.add_reaction(DOUBLE_DOWN)
 
     def check(reaction, user):
         return (
             user == ctx.author
             and reaction.message.id == trivia_msg.id
-            and str(reaction.emoji) in [GREEN_CIRCLE, RED_CIRCLE]
+            and str(reaction.emoji) in question["choices"]
         )
 
     try:
@@ -532,9 +974,8 @@ async def do_match_trivia(ctx):
         await ctx.send("You took too long to respond.")
         return
 
-    guess_radiant = (str(reaction.emoji) == GREEN_CIRCLE)
-    updated_msg = await ctx.fetch_message(trivia_msg.id)
     double_down_triggered = False
+    updated_msg = await ctx.fetch_message(trivia_msg.id)
     for r in updated_msg.reactions:
         if str(r.emoji) == DOUBLE_DOWN:
             async for reactor in r.users():
@@ -542,38 +983,122 @@ async def do_match_trivia(ctx):
                     double_down_triggered = True
                     break
 
-    actual_radiant_win = match["radiant_win"]
-    if guess_radiant == actual_radiant_win:
-        points = 10 if double_down_triggered else 5
-        result_text = f"Correct! You gain {points} MMR."
+    change = trivia_points(str(reaction.emoji) == question["correct"], double_down_triggered)
+    if change > 0:
+        result_text = f"Correct! You gain {change} MMR."
     else:
-        points = -10 if double_down_triggered else -5
-        result_text = f"Incorrect! You lose {abs(points)} MMR."
+        result_text = f"Incorrect! You lose {abs(change)} MMR."
 
+    # Update MMR
     user_id = str(ctx.author.id)
-    data = load_currency_data()
-    record = data.get(user_id, {"currency": 0, "last_daily": "none"})
-    record["currency"] += points
-    data[user_id] = record
-    save_currency_data(data)
+    balances = apply_currency_changes({user_id: change})
 
-    winner_str = "Radiant" if match["radiant_win"] else "Dire"
     await ctx.send(
         f"{ctx.author.mention} {result_text}\n"
-        f"The actual winner was **{winner_str}**.\n"
-        f"Your new MMR: **{record['currency']}**."
+        f"{question['reveal']}\n"
+        f"Your new MMR: **{balances[user_id]}**."
     )
 
+def format_player_list(results):
+    """
+    Formats [(user_id, change, balance)] as mention lines, within an embed field's 1024 chars.
+    """
+    lines = []
+    length = 0
+    for i, (user_id, change, balance) in enumerate(results):
+        line = f"<@{user_id}> {change:+d} ({balance})"
+        if length + len(line) + 1 > 1000:
+            lines.append(f"...and {len(results) - i} more")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines) if lines else "None"
+
+async def run_open_trivia(ctx, question):
+    """
+    Everyone in the channel can answer until the deadline. Answers and double
+    downs are collected from reaction events, then all payouts are settled in
+    a single currency load/save and announced in one message.
+    """
+    embed = question["embed"]
+    embed.set_footer(text=f"{embed.footer.text}\nOpen round: everyone can answer for {OPEN_TRIVIA_SECONDS}s.")
+    trivia_msg = await ctx.send(embed=embed, file=question["file"])
+
+    round_state = {"choices": question["choices"], "answers": {}, "double_down": set()}
+    open_trivia_rounds[trivia_msg.id] = round_state
+    try:
+        for emoji in question["choices"]:
+            await trivia_msg.add_reaction(emoji)
+        await trivia_msg.add_reaction(DOUBLE_DOWN)
+        await asyncio.sleep(OPEN_TRIVIA_SECONDS)
+    finally:
+        open_trivia_rounds.pop(trivia_msg.id, None)
+
+    changes = {}
+    for user_id, picks in round_state["answers"].items():
+        changes[str(user_id)] = trivia_points(
+            picks[-1] == question["correct"], user_id in round_state["double_down"]
+        )
+
+    result = discord.Embed(title="Trivia Results", description=question["reveal"], color=discord.Color.blue())
+    if not changes:
+        result.add_field(name="Players", value="Nobody answered.", inline=False)
+        await trivia_msg.reply(embed=result)
+        return
+
+    balances = apply_currency_changes(changes)
+    winners = [(uid, change, balances[uid]) for uid, change in changes.items() if change > 0]
+    losers = [(uid, change, balances[uid]) for uid, change in changes.items() if change < 0]
+    result.add_field(name=f"Correct ({len(winners)})", value=format_player_list(winners), inline=False)
+    result.add_field(name=f"Incorrect ({len(losers)})", value=format_player_list(losers), inline=False)
+    await trivia_msg.reply(embed=result, allowed_mentions=discord.AllowedMentions.none())
+
+def track_open_trivia_reaction(reaction, user, added):
+    """
+    Records an answer or double down for an open trivia round.
+    Returns False if the message is not an open round.
+    """
+    round_state = open_trivia_rounds.get(reaction.message.id)
+    if round_state is None:
+        return False
+    emoji = str(reaction.emoji)
+    if emoji == DOUBLE_DOWN:
+        if added:
+            round_state["double_down"].add(user.id)
+        else:
+            round_state["double_down"].discard(user.id)
+    elif emoji in round_state["choices"]:
+        # The most recent pick still on the message wins, so removing a
+        # later pick falls back to an earlier one that is still visible
+        picks = round_state["answers"].setdefault(user.id, [])
+        if emoji in picks:
+            picks.remove(emoji)
+        if added:
+            picks.append(emoji)
+        elif not picks:
+            del round_state["answers"][user.id]
+    return True
+
 @bot.command(aliases=['TRIVIA'])
-async def trivia(ctx):
+@throttled(command_throttle, metrics)
+async def trivia(ctx, mode=None):
     """
     50% chance for Over/Under hero stat trivia
     50% chance for match-based trivia (no hero images).
+    `!trivia open` starts a channel-wide round anyone can answer.
     """
     if random.random() < 0.5:
-        await do_hero_over_under_trivia(ctx)
+        question, error = await build_hero_over_under_question()
+    else:
+        question, error = await build_match_question()
+    if error:
+        await ctx.send(error)
+        return
+
+    if mode and mode.lower() in ("open", "all"):
+        await run_open_trivia(ctx, question)
     else:
-        await do_match_trivia(ctx)
+        await run_solo_trivia(ctx, question)
 
 # =======================
 # Run the Bot
@@ -581,4 +1106,6 @@ async def trivia(ctx):
 if __name__ == "__main__":
     # MAKE SURE to set your environment variable or replace "YOUR_BOT_TOKEN_HERE"
     bot.run(TOKEN)
-    
\ No newline at end of file
+    # bot.run returns on a clean shutdown (Ctrl+C or bot.close())
+    save_warm_state()
+    
@@ -0,0 +1,197 @@
+import io
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import statistics
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+# Cards only ever read images from these folders; nothing is fetched while rendering
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+HERO_ASSETS_DIR = os.path.join(ASSETS_DIR, "heroes")
+
+CARD_WIDTH = 640
+ROW_HEIGHT = 56
+AVATAR_SIZE = 44
+BACKGROUND = (32, 34, 37)
+HEADER_COLOR = (241, 196, 15)
+TEXT_COLOR = (220, 221, 222)
+PLACEHOLDER = (64, 68, 75)
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+def _paste_image(card, path, box, size):
+    """
+    Pastes the local image at `path` into `card`, or a grey square if it is missing.
+    """
+    image = None
+    if path and os.path.exists(path):
+        try:
+            image = Image.open(path).convert("RGBA").resize(size)
+        except OSError:
+            image = None
+    if image is None:
+        image = Image.new("RGBA", size, PLACEHOLDER)
+    card.paste(image, box, image)
+
+def hero_asset_path(hero):
+    """
+    Returns the local portrait path for a heroStats entry, based on its `img` file name.
+    """
+    img = hero.get("img")
+    if not img:
+        return None
+    return os.path.join(HERO_ASSETS_DIR, os.path.basename(img.split("?")[0]))
+
+def render_leaderboard_card(title, rows):
+    """
+    Renders a ranked table as PNG bytes.
+    rows: list of (rank, name, value_text, avatar_path or None)
+    """
+    height = 70 + ROW_HEIGHT * max(len(rows), 1)
+    card = Image.new("RGBA", (CARD_WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(card)
+    draw.text((20, 18), title, font=_font(30), fill=HEADER_COLOR)
+
+    font = _font(22)
+    for i, (rank, name, value_text, avatar_path) in enumerate(rows):
+        top = 70 + i * ROW_HEIGHT
+        draw.text((20, top + 12), f"{rank}.", font=font, fill=TEXT_COLOR)
+        _paste_image(card, avatar_path, (70, top + 4), (AVATAR_SIZE, AVATAR_SIZE))
+        draw.text((130, top + 12), name, font=font, fill=TEXT_COLOR)
+        value_width = draw.textlength(value_text, font=font)
+        draw.text((CARD_WIDTH - 20 - value_width, top + 12), value_text, font=font, fill=HEADER_COLOR)
+
+    out = io.BytesIO()
+    card.convert("RGB").save(out, format="PNG", optimize=False)
+    return out.getvalue()
+
+def render_hero_stat_card(hero_name, stat, displayed_value, portrait_path):
+    """
+    Renders an Over/Under card (hero portrait, stat name and the shown value) as PNG bytes.
+    """
+    card = Image.new("RGBA", (CARD_WIDTH, 240), BACKGROUND)
+    draw = ImageDraw.Draw(card)
+    _paste_image(card, portrait_path, (20, 20), (256, 144))
+    draw.text((296, 24), hero_name, font=_font(30), fill=HEADER_COLOR)
+    draw.text((296, 80), stat, font=_font(24), fill=TEXT_COLOR)
+    draw.text((296, 120), str(displayed_value), font=_font(40), fill=TEXT_COLOR)
+    draw.text((20, 190), "Over or Under?", font=_font(26), fill=TEXT_COLOR)
+
+    out = io.BytesIO()
+    card.convert("RGB").save(out, format="PNG", optimize=False)
+    return out.getvalue()
+
+RENDERERS = {
+    "leaderboard": render_leaderboard_card,
+    "hero_stat": render_hero_stat_card,
+}
+
+def _render(kind, args):
+    # Runs in the worker process
+    return RENDERERS[kind](*args)
+
+class CardRenderer:
+    """
+    Renders cards in a process pool so the event loop never blocks on Pillow.
+    Results are kept in an LRU cache keyed by a hash of the card contents, and
+    concurrent requests for the same card share one render.
+    """
+
+    def __init__(self, max_workers=2, cache_size=128):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.executor = None
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def available():
+        return Image is not None
+
+    @staticmethod
+    def content_key(kind, args):
+        # Asset paths are part of the key, so a new avatar file means a new card
+        blob = json.dumps([kind, args], sort_keys=True, default=str).encode()
+        return hashlib.sha256(blob).hexdigest()
+
+    async def render(self, kind, *args):
+        """
+        Returns PNG bytes for the card, rendering it in the pool on a cache miss.
+        """
+        key = self.content_key(kind, args)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if key in self.in_flight:
+            self.hits += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        self.misses += 1
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        fut = asyncio.get_running_loop().run_in_executor(self.executor, _render, kind, args)
+        self.in_flight[key] = fut
+        try:
+            png = await asyncio.shield(fut)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool on the next render
+            self.executor = None
+            raise
+        finally:
+            self.in_flight.pop(key, None)
+
+        self.cache[key] = png
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return png
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+def bench(iterations):
+    """
+    Measures per-card render latency in this process (no pool, no cache).
+    """
+    rows = [(i, f"Player {i}", f"{1000 - i * 37} MMR", None) for i in range(1, 11)]
+    cases = {
+        "leaderboard": ("Top MMR Holders", rows),
+        "hero_stat": ("Anti-Mage", "move_speed", 372.4, None),
+    }
+    for kind, args in cases.items():
+        _render(kind, args)  # warm up fonts
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            _render(kind, args)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        print(f"{kind:12s} mean {statistics.mean(samples):6.2f} ms  p95 {p95:6.2f} ms  ({iterations} renders)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark card rendering")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    if Image is None:
+        raise SystemExit("Pillow is not installed: pip install -U pillow")
+    bench(args.iterations)
@@ -0,0 +1,83 @@
+"""
+Runs minimal_bot.py as a cluster: one ledger service process owning the
+currency and role data, plus one worker process per shard group.
+
+    python cluster.py --workers 4 --shards 8
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+from ledger import LEDGER_SOCKET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def shard_groups(shard_count, workers):
+    """
+    Splits shard ids 0..shard_count-1 round-robin across `workers` groups.
+    """
+    return [list(range(i, shard_count, workers)) for i in range(min(workers, shard_count))]
+
+def wait_for_socket(path, proc, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if proc.poll() is not None:
+            raise RuntimeError("Ledger service exited before it started listening.")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Ledger service did not create {path} in time.")
+        time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run DotaBot shard groups in separate processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--shards", type=int, default=None, help="total shard count (default: one per worker)")
+    parser.add_argument("--socket", default=LEDGER_SOCKET, help="ledger service Unix socket path")
+    args = parser.parse_args()
+
+    shard_count = args.shards or args.workers
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    # Children run in their own sessions so Ctrl+C reaches only this launcher,
+    # and shutdown() stops them in order: workers first, then the ledger
+    ledger_proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "ledger.py"), "--socket", args.socket],
+        start_new_session=True
+    )
+    wait_for_socket(args.socket, ledger_proc)
+
+    workers = []
+    for shard_ids in shard_groups(shard_count, args.workers):
+        env = dict(os.environ)
+        env["DOTABOT_SHARD_COUNT"] = str(shard_count)
+        env["DOTABOT_SHARD_IDS"] = ",".join(str(s) for s in shard_ids)
+        env["DOTABOT_LEDGER_SOCKET"] = args.socket
+        workers.append(subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "minimal_bot.py")], env=env, start_new_session=True
+        ))
+        print(f"Started worker for shards {shard_ids}")
+
+    def shutdown(*_):
+        for proc in workers:
+            proc.terminate()
+        for proc in workers:
+            proc.wait()
+        # Stop the ledger last so in-flight writes from workers still land
+        ledger_proc.terminate()
+        ledger_proc.wait()
+        sys.exit(0)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    # If any process dies, take the whole cluster down rather than run degraded
+    while all(proc.poll() is None for proc in workers + [ledger_proc]):
+        time.sleep(1)
+    print("A cluster process exited. Shutting down.")
+    shutdown()
+
+if __name__ == "__main__":
+    main()
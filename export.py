@@ -0,0 +1,119 @@
+"""
+Streams one guild's ledger records to CSV or JSON Lines and computes its
+aggregates in the same pass, without loading the other guilds' records.
+
+    python export.py --guild 123456789 --format jsonl --out points.jsonl
+    python export.py --guild 123456789 --stats-only
+"""
+import sys
+import csv
+import json
+import argparse
+from datetime import date
+
+from ledger import CURRENCY_FILE, DEFAULT_ZONE, DayClock, load_zone_data
+
+EXPORT_FIELDS = ["user_id", "currency", "last_claim_date", "streak"]
+# Anyone who claimed within this many days counts as active
+ACTIVE_DAYS = 7
+# (label, lowest streak in bucket); each bucket runs up to the next one's start
+STREAK_BUCKETS = [("0", 0), ("1", 1), ("2-6", 2), ("7-29", 7), ("30+", 30)]
+
+def iter_guild_records(guild_id, path=CURRENCY_FILE):
+    """
+    Yields the guild's rows from the currency CSV one at a time.
+    """
+    try:
+        f = open(path, "r", newline="")
+    except FileNotFoundError:
+        return
+    with f:
+        for row in csv.DictReader(f):
+            if row["server_id"] == guild_id:
+                yield {
+                    "user_id": row["user_id"],
+                    "currency": int(row["currency"]),
+                    "last_claim_date": row["last_claim_date"],
+                    "streak": int(row["streak"])
+                }
+
+class GuildStats:
+    """
+    Running aggregates over a stream of records; constant memory.
+    """
+
+    def __init__(self, today):
+        self.today = today
+        self.users = 0
+        self.active_users = 0
+        self.total_points = 0
+        self.streaks = {label: 0 for label, _ in STREAK_BUCKETS}
+
+    def add(self, record):
+        self.users += 1
+        self.total_points += record["currency"]
+        if record["last_claim_date"] != "none":
+            claimed = date.fromisoformat(record["last_claim_date"]).toordinal()
+            if self.today - claimed < ACTIVE_DAYS:
+                self.active_users += 1
+        label = STREAK_BUCKETS[0][0]
+        for bucket_label, low in STREAK_BUCKETS:
+            if record["streak"] >= low:
+                label = bucket_label
+        self.streaks[label] += 1
+
+    def summary(self):
+        return {
+            "users": self.users,
+            "active_users": self.active_users,
+            "total_points": self.total_points,
+            "streaks": dict(self.streaks),
+        }
+
+def guild_today(guild_id):
+    """
+    Returns today's date ordinal in the guild's timezone.
+    """
+    zone = load_zone_data().get(guild_id, DEFAULT_ZONE)
+    return DayClock().today(zone)
+
+def export_guild(guild_id, out=None, fmt="csv", path=CURRENCY_FILE):
+    """
+    Writes the guild's records to the text stream `out` (skipped if None) as
+    'csv' or 'jsonl', and returns the aggregates computed along the way.
+    """
+    stats = GuildStats(guild_today(guild_id))
+    writer = None
+    if out is not None and fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+
+    for record in iter_guild_records(guild_id, path):
+        stats.add(record)
+        if writer is not None:
+            writer.writerow(record)
+        elif out is not None:
+            out.write(json.dumps(record) + "\n")
+    return stats.summary()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export one guild's points and stats")
+    parser.add_argument("--guild", required=True, help="server id")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    parser.add_argument("--stats-only", action="store_true", help="print aggregates without exporting rows")
+    args = parser.parse_args()
+
+    if args.stats_only:
+        summary = export_guild(args.guild)
+    elif args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as out:
+            summary = export_guild(args.guild, out, args.format)
+    else:
+        summary = export_guild(args.guild, sys.stdout, args.format)
+
+    # Keep stdout clean for the export itself
+    print(json.dumps(summary), file=sys.stderr if not args.stats_only else sys.stdout)
+
+if __name__ == "__main__":
+    main()
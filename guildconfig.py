@@ -0,0 +1,131 @@
+import os
+import copy
+import json
+import unicodedata
+
+import discord
+
+def emoji_key(emoji):
+    """
+    Normalizes an emoji to a dict key: the string itself for unicode emoji,
+    the integer id for custom emoji. Accepts reaction emoji objects or
+    configured strings like "<:immortal:1156278341096194098>".
+    """
+    if isinstance(emoji, str):
+        if emoji.startswith("<"):
+            partial = discord.PartialEmoji.from_str(emoji)
+            if partial.id is not None:
+                return partial.id
+        return emoji
+    if getattr(emoji, "id", None) is not None:
+        return emoji.id
+    return str(emoji)
+
+# Fewer than two players can never fill a queue
+MIN_THRESHOLD = 2
+# Unicode categories that appear in emoji sequences (symbols, variation
+# selectors, zero-width joiners, keycap marks); digits, # and * start keycaps
+EMOJI_CATEGORIES = {"So", "Sk", "Mn", "Me", "Cf"}
+
+def is_valid_emoji(text):
+    """
+    True for a custom emoji like "<:immortal:123>" or a short run of unicode
+    emoji characters; false for plain words.
+    """
+    partial = discord.PartialEmoji.from_str(text)
+    if partial.id is not None:
+        return True
+    if not text or len(text) > 16:
+        return False
+    has_symbol = False
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category == "So":
+            has_symbol = True
+        elif category not in EMOJI_CATEGORIES and not (ch.isdigit() or ch in "#*"):
+            return False
+    return has_symbol or "\u20e3" in text
+
+class ConfigError(Exception):
+    """
+    Raised for a setting that would break a queue; the message is user-facing.
+    """
+
+class GuildConfig:
+    """
+    Resolved settings for one guild: defaults merged with its overrides.
+    `emoji_modes` maps emoji_key(emoji) -> mode name for enabled modes.
+    """
+
+    def __init__(self, daily_reward, modes):
+        self.daily_reward = daily_reward
+        # mode name -> {'emoji', 'threshold', 'header', 'enabled'}
+        self.modes = modes
+        self.emoji_modes = {
+            emoji_key(mode["emoji"]): name for name, mode in modes.items() if mode["enabled"]
+        }
+
+class GuildConfigStore:
+    """
+    Per-guild overrides of the bot's defaults, persisted as one JSON file.
+    The file is read once; resolved configs are cached per guild and dropped
+    whenever that guild's overrides change. Setters raise ConfigError for values
+    that would break a queue.
+    """
+
+    def __init__(self, path, daily_reward, modes, reserved_emoji=()):
+        self.path = path
+        self.default_reward = daily_reward
+        self.default_modes = modes
+        # Emoji the bot uses for itself (e.g. cancel) that no mode may take
+        self.reserved_emoji = {emoji_key(e) for e in reserved_emoji}
+        self.cache = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.overrides = json.load(f)
+        except (OSError, ValueError):
+            self.overrides = {}
+
+    def get(self, guild_id):
+        guild_id = str(guild_id)
+        config = self.cache.get(guild_id)
+        if config is None:
+            override = self.overrides.get(guild_id, {})
+            modes = copy.deepcopy(self.default_modes)
+            for name, changes in override.get("modes", {}).items():
+                modes.setdefault(name, {"emoji": "", "threshold": 0, "header": name, "enabled": True})
+                modes[name].update(changes)
+            config = GuildConfig(override.get("daily_reward", self.default_reward), modes)
+            self.cache[guild_id] = config
+        return config
+
+    def set_daily_reward(self, guild_id, amount):
+        if amount < 0:
+            raise ConfigError("The daily reward can't be negative.")
+        self._update(str(guild_id), lambda o: o.__setitem__("daily_reward", amount))
+
+    def set_mode(self, guild_id, mode, **changes):
+        """
+        Overrides fields of a mode (creating it if it is new) for one guild.
+        """
+        if "threshold" in changes and changes["threshold"] < MIN_THRESHOLD:
+            raise ConfigError(f"The threshold must be at least {MIN_THRESHOLD}.")
+        if "emoji" in changes:
+            emoji = changes["emoji"]
+            if not is_valid_emoji(emoji):
+                raise ConfigError(f"`{emoji}` is not an emoji.")
+            key = emoji_key(emoji)
+            if key in self.reserved_emoji:
+                raise ConfigError(f"{emoji} is reserved by the bot.")
+            for name, settings in self.get(guild_id).modes.items():
+                if name != mode and emoji_key(settings["emoji"]) == key:
+                    raise ConfigError(f"{emoji} is already used by `{name}`.")
+        self._update(str(guild_id), lambda o: o.setdefault("modes", {}).setdefault(mode, {}).update(changes))
+
+    def _update(self, guild_id, change):
+        change(self.overrides.setdefault(guild_id, {}))
+        self.cache.pop(guild_id, None)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.overrides, f)
+        os.replace(tmp_path, self.path)
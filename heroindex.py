@@ -0,0 +1,175 @@
+import re
+from collections import Counter
+
+# Community shorthand that can't be derived from the hero's names
+HERO_ALIASES = {
+    "wr": "Windranger",
+    "qop": "Queen of Pain",
+    "kotl": "Keeper of the Light",
+    "np": "Nature's Prophet",
+    "prophet": "Nature's Prophet",
+    "furion": "Nature's Prophet",
+    "sf": "Shadow Fiend",
+    "ss": "Shadow Shaman",
+    "rhasta": "Shadow Shaman",
+    "wk": "Wraith King",
+    "skeleton king": "Wraith King",
+    "od": "Outworld Destroyer",
+    "es": "Earthshaker",
+    "et": "Elder Titan",
+    "ld": "Lone Druid",
+    "lc": "Legion Commander",
+    "bb": "Bristleback",
+    "bh": "Bounty Hunter",
+    "bs": "Bloodseeker",
+    "bm": "Beastmaster",
+    "cm": "Crystal Maiden",
+    "ck": "Chaos Knight",
+    "dk": "Dragon Knight",
+    "dp": "Death Prophet",
+    "ds": "Dark Seer",
+    "dw": "Dark Willow",
+    "pa": "Phantom Assassin",
+    "pl": "Phantom Lancer",
+    "ta": "Templar Assassin",
+    "tb": "Terrorblade",
+    "ns": "Night Stalker",
+    "sk": "Sand King",
+    "sb": "Spirit Breaker",
+    "sd": "Shadow Demon",
+    "ts": "Timbersaw",
+    "wd": "Witch Doctor",
+    "ww": "Winter Wyvern",
+    "aa": "Ancient Apparition",
+    "am": "Anti-Mage",
+    "void": "Faceless Void",
+    "fv": "Faceless Void",
+    "cent": "Centaur Warrunner",
+    "clock": "Clockwerk",
+    "jugg": "Juggernaut",
+    "alch": "Alchemist",
+    "veno": "Venomancer",
+    "brew": "Brewmaster",
+    "spec": "Spectre",
+    "mk": "Monkey King",
+    "ember": "Ember Spirit",
+    "storm": "Storm Spirit",
+    "void spirit": "Void Spirit",
+    "zeus": "Zeus",
+    "potm": "Mirana",
+    "gyro": "Gyrocopter",
+    "naix": "Lifestealer",
+    "ls": "Lifestealer",
+    "ogre": "Ogre Magi",
+    "lesh": "Leshrac",
+    "invo": "Invoker",
+    "weaver": "Weaver",
+}
+
+def normalize(text):
+    """
+    Lowercases and strips everything but letters, digits and single spaces.
+    """
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class HeroIndex:
+    """
+    Typo- and abbreviation-tolerant hero lookup. Every hero gets a set of keys
+    (localized name, internal name, initials, aliases); exact keys resolve with
+    one dict lookup and everything else is ranked by trigram similarity.
+    The index is immutable once built; rebuild it when hero data changes.
+    """
+
+    def __init__(self, heroes, state=None):
+        # Slots are positions in `heroes`
+        self.heroes = list(heroes)
+        if state is not None:
+            self.exact = state["exact"]
+            self.keys = state["keys"]
+            self.key_sizes = state["key_sizes"]
+            self.postings = state["postings"]
+            return
+        self.exact = {}
+        self.keys = []
+        self.key_sizes = []
+        self.postings = {}
+
+        by_name = {}
+        for slot, hero in enumerate(self.heroes):
+            name = hero.get("localized_name")
+            if not name:
+                continue
+            by_name[name] = slot
+
+            keys = {normalize(name), normalize(name).replace(" ", "")}
+            internal = hero.get("name", "").replace("npc_dota_hero_", "")
+            if internal:
+                keys.add(normalize(internal))
+            words = normalize(name.replace("-", " ")).split()
+            if len(words) > 1:
+                keys.add("".join(w[0] for w in words))
+            for key in keys:
+                self._add_key(key, slot)
+
+        for alias, name in HERO_ALIASES.items():
+            if name in by_name:
+                self._add_key(alias, by_name[name])
+
+    def to_state(self):
+        """
+        Returns the index as JSON-serializable data (without the hero list);
+        restore it with HeroIndex(heroes, state).
+        """
+        return {
+            "exact": self.exact,
+            "keys": self.keys,
+            "key_sizes": self.key_sizes,
+            "postings": self.postings,
+        }
+
+    def _add_key(self, key, slot):
+        if not key:
+            return
+        # Hand-written aliases win over generated initials
+        self.exact[key] = slot
+        key_id = len(self.keys)
+        self.keys.append(slot)
+        grams = trigrams(key)
+        self.key_sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(key_id)
+
+    def search(self, query, limit=3, min_score=0.25):
+        """
+        Returns up to `limit` (hero, score) pairs, best first. An exact key match scores 1.0.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        if query in self.exact:
+            return [(self.heroes[self.exact[query]], 1.0)]
+
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        best = {}
+        for key_id, count in shared.items():
+            score = count / (len(grams) + self.key_sizes[key_id] - count)
+            slot = self.keys[key_id]
+            if score >= min_score and score > best.get(slot, 0.0):
+                best[slot] = score
+        ranked = sorted(best.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [(self.heroes[slot], score) for slot, score in ranked]
+
+    def find(self, query):
+        """
+        Returns the best matching hero dict, or None.
+        """
+        results = self.search(query, limit=1)
+        return results[0][0] if results else None
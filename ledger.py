@@ -0,0 +1,552 @@
+import os
+import csv
+import json
+import time
+import signal
+import asyncio
+import argparse
+import tempfile
+import zoneinfo
+from datetime import date, datetime, timedelta
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "dotabotcache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+CURRENCY_FILE = os.path.join(CACHE_DIR, "currency.csv")
+ROLE_FILE = os.path.join(CACHE_DIR, "role_ids.csv")
+ZONE_FILE = os.path.join(CACHE_DIR, "guild_zones.csv")
+LEDGER_SOCKET = os.path.join(CACHE_DIR, "ledger.sock")
+
+# Timezone for guilds that have not picked one with !timezone
+DEFAULT_ZONE = "America/Los_Angeles"
+# Changes are held in memory and written out this often (seconds), or as soon
+# as this many writes are pending, so a request never pays for a full rewrite
+FLUSH_INTERVAL = 2.0
+FLUSH_THRESHOLD = 1000
+# How often the service sweeps expired streaks (seconds); guilds hit midnight
+# at different times, and a sweep only touches zones whose midnight passed
+STREAK_SWEEP_INTERVAL = 60
+
+def load_currency_data():
+    """
+    Returns currency data in the format:
+    {
+      server_id: {
+        user_id: {
+          'currency': int,
+          'last_claim_day': int (date ordinal, 0 if never claimed),
+          'streak': int
+        }
+      }
+    }
+    """
+    data = {}
+    if os.path.exists(CURRENCY_FILE):
+        with open(CURRENCY_FILE, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                sid = row["server_id"]
+                uid = row["user_id"]
+                if sid not in data:
+                    data[sid] = {}
+                last_claim = row["last_claim_date"]
+                data[sid][uid] = {
+                    "currency": int(row["currency"]),
+                    "last_claim_day": 0 if last_claim == "none" else date.fromisoformat(last_claim).toordinal(),
+                    "streak": int(row["streak"])
+                }
+    return data
+
+def save_currency_data(data):
+    """
+    Saves the currency data dictionary to CSV. The file is written next to
+    the old one and swapped in, so readers never see a partial file.
+    """
+    tmp_path = CURRENCY_FILE + ".tmp"
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.DictWriter(
+            f,
+            fieldnames=["server_id", "user_id", "currency", "last_claim_date", "streak"]
+        )
+        writer.writeheader()
+        for server_id, user_dict in data.items():
+            for user_id, record in user_dict.items():
+                writer.writerow({
+                    "server_id": server_id,
+                    "user_id": user_id,
+                    "currency": record["currency"],
+                    "last_claim_date": (
+                        date.fromordinal(record["last_claim_day"]).isoformat()
+                        if record["last_claim_day"] else "none"
+                    ),
+                    "streak": record["streak"]
+                })
+    os.replace(tmp_path, CURRENCY_FILE)
+
+def load_role_data():
+    """
+    Returns a dictionary mapping server IDs to stored role IDs:
+    { server_id: role_id }
+    """
+    data = {}
+    if os.path.exists(ROLE_FILE):
+        with open(ROLE_FILE, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                data[row["server_id"]] = row["role_id"]
+    return data
+
+def save_role_data(data):
+    """
+    Saves the server-to-role mapping data to CSV.
+    """
+    with open(ROLE_FILE, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["server_id", "role_id"])
+        writer.writeheader()
+        for sid, rid in data.items():
+            writer.writerow({"server_id": sid, "role_id": rid})
+
+def load_zone_data():
+    """
+    Returns a dictionary mapping server IDs to IANA timezone names:
+    { server_id: zone }
+    """
+    data = {}
+    if os.path.exists(ZONE_FILE):
+        with open(ZONE_FILE, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                data[row["server_id"]] = row["zone"]
+    return data
+
+def save_zone_data(data):
+    """
+    Saves the server-to-timezone mapping data to CSV.
+    """
+    with open(ZONE_FILE, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["server_id", "zone"])
+        writer.writeheader()
+        for sid, zone in data.items():
+            writer.writerow({"server_id": sid, "zone": zone})
+
+class DayClock:
+    """
+    Caches, per timezone, the current local day (as a date ordinal) and the
+    epoch time of the next local midnight. Both are recomputed only once that
+    midnight has passed, so a lookup is normally one float comparison.
+    """
+
+    def __init__(self):
+        # zone name -> (day ordinal, next midnight epoch)
+        self.zones = {}
+
+    def day(self, zone, now=None):
+        """
+        Returns (today's ordinal, next midnight epoch) in `zone`.
+        """
+        if now is None:
+            now = time.time()
+        entry = self.zones.get(zone)
+        if entry is None or now >= entry[1]:
+            tz = zoneinfo.ZoneInfo(zone)
+            today = datetime.fromtimestamp(now, tz).date()
+            next_midnight = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+            entry = (today.toordinal(), next_midnight.timestamp())
+            self.zones[zone] = entry
+        return entry
+
+    def today(self, zone, now=None):
+        return self.day(zone, now)[0]
+
+class LedgerError(Exception):
+    """
+    Raised when the ledger rejects a request or the service is unreachable.
+    """
+
+class Ledger:
+    """
+    Owns the currency and role data. Requests are applied in batches of
+    (op, args) pairs to the in-memory data. The CSV files are rewritten by
+    flush(), which the owner calls every FLUSH_INTERVAL; execute() only
+    flushes early once FLUSH_THRESHOLD writes are pending.
+
+    Each guild has a leaderboard version that only changes when a write could
+    change its cached top-N, so callers can keep rendered leaderboards until then.
+    """
+
+    def __init__(self):
+        self.currency = load_currency_data()
+        self.roles = load_role_data()
+        self.zones = load_zone_data()
+        self.currency_dirty = False
+        self.roles_dirty = False
+        self.zones_dirty = False
+        # Writes applied since the last flush
+        self.unflushed = 0
+        self.clock = DayClock()
+        # guild_id -> {'n', 'points', 'streaks'} for the last computed top-N
+        self.top_cache = {}
+        # Versions start from the startup time so they never repeat across restarts
+        self.version_base = time.time_ns()
+        self.top_versions = {}
+        # (zone, last_claim_day) -> {(guild_id, user_id)} for every user with a live streak
+        self.claim_buckets = {}
+        for guild_id, user_dict in self.currency.items():
+            for user_id, record in user_dict.items():
+                self._bucket_add(guild_id, user_id, record)
+
+    def _zone(self, guild_id):
+        return self.zones.get(guild_id, DEFAULT_ZONE)
+
+    def _bucket_add(self, guild_id, user_id, record):
+        if record["streak"] > 0 and record["last_claim_day"]:
+            key = (self._zone(guild_id), record["last_claim_day"])
+            self.claim_buckets.setdefault(key, set()).add((guild_id, user_id))
+
+    def _bucket_remove(self, guild_id, user_id, record):
+        key = (self._zone(guild_id), record["last_claim_day"])
+        bucket = self.claim_buckets.get(key)
+        if bucket is not None:
+            bucket.discard((guild_id, user_id))
+            if not bucket:
+                del self.claim_buckets[key]
+
+    def _top_version(self, guild_id):
+        return self.top_versions.get(guild_id, self.version_base)
+
+    def _touch(self, guild_id, user_id, changes):
+        """
+        Invalidates the guild's cached top-N if a changed field moves a user
+        already in that list, or lets a new user into it. `changes` maps the
+        fields that were written ('currency', 'streak') to (old, new).
+        """
+        cached = self.top_cache.get(guild_id)
+        if cached is None:
+            return
+        affected = False
+        for key, field in (("points", "currency"), ("streaks", "streak")):
+            if field not in changes:
+                continue
+            old, new = changes[field]
+            entries = cached[key]
+            if any(uid == user_id for uid, _ in entries):
+                affected = affected or old != new
+            # A short list holds every user, so anyone missing from it is new
+            elif len(entries) < cached["n"] or new > entries[-1][1]:
+                affected = True
+        if affected:
+            del self.top_cache[guild_id]
+            self.top_versions[guild_id] = self._top_version(guild_id) + 1
+
+    def _record(self, guild_id, user_id):
+        guild = self.currency.setdefault(guild_id, {})
+        if user_id not in guild:
+            guild[user_id] = {"currency": 0, "last_claim_day": 0, "streak": 0}
+        return guild[user_id]
+
+    def op_get(self, guild_id, user_id):
+        record = self.currency.get(guild_id, {}).get(user_id)
+        if record is None:
+            return {"currency": 0, "last_claim_day": 0, "streak": 0}
+        return dict(record)
+
+    def op_claim_daily(self, guild_id, user_id, reward):
+        """
+        Claims the daily reward for the current day in the guild's timezone,
+        updating the streak. Returns {'claimed': bool, 'record': {...},
+        'next_midnight': epoch seconds of the guild's next local midnight}.
+        """
+        today, next_midnight = self.clock.day(self._zone(guild_id))
+        record = self._record(guild_id, user_id)
+        if record["last_claim_day"] == today:
+            return {"claimed": False, "record": dict(record), "next_midnight": next_midnight}
+
+        old_currency, old_streak = record["currency"], record["streak"]
+        self._bucket_remove(guild_id, user_id, record)
+        if today - record["last_claim_day"] == 1:
+            record["streak"] += 1
+        else:
+            record["streak"] = 1
+        record["last_claim_day"] = today
+        record["currency"] += reward
+        self._bucket_add(guild_id, user_id, record)
+
+        self.currency_dirty = True
+        self.unflushed += 1
+        self._touch(guild_id, user_id, {
+            "currency": (old_currency, record["currency"]),
+            "streak": (old_streak, record["streak"]),
+        })
+        return {"claimed": True, "record": dict(record), "next_midnight": next_midnight}
+
+    def op_expire_streaks(self):
+        """
+        Resets the streak of everyone whose last claim is before yesterday in
+        their guild's timezone. Only the buckets that fell out of the window are
+        visited, so the cost is proportional to the number of expiring users.
+        Returns that number.
+        """
+        # After each sweep only yesterday's and today's bucket per zone remain
+        expired_keys = [
+            key for key in self.claim_buckets
+            if key[1] < self.clock.today(key[0]) - 1
+        ]
+        expired = 0
+        for key in expired_keys:
+            for guild_id, user_id in self.claim_buckets.pop(key):
+                record = self.currency[guild_id][user_id]
+                old_streak, record["streak"] = record["streak"], 0
+                self._touch(guild_id, user_id, {"streak": (old_streak, 0)})
+                expired += 1
+        if expired:
+            self.currency_dirty = True
+            self.unflushed += expired
+        return expired
+
+    def op_add(self, guild_id, user_id, amount):
+        record = self._record(guild_id, user_id)
+        old_currency = record["currency"]
+        record["currency"] += amount
+        self.currency_dirty = True
+        self.unflushed += 1
+        self._touch(guild_id, user_id, {"currency": (old_currency, record["currency"])})
+        return dict(record)
+
+    def op_top(self, guild_id, n, known_version=None):
+        """
+        Returns the top `n` users by points and by streak as [user_id, value] pairs,
+        along with the leaderboard version. If `known_version` is still current,
+        only {'version': ...} is returned.
+        """
+        version = self._top_version(guild_id)
+        if known_version == version:
+            return {"version": version}
+
+        cached = self.top_cache.get(guild_id)
+        if cached is None or cached["n"] != n:
+            server_data = self.currency.get(guild_id, {})
+            by_points = sorted(server_data.items(), key=lambda x: x[1]["currency"], reverse=True)[:n]
+            by_streak = sorted(server_data.items(), key=lambda x: x[1]["streak"], reverse=True)[:n]
+            cached = {
+                "n": n,
+                "points": [[uid, info["currency"]] for uid, info in by_points],
+                "streaks": [[uid, info["streak"]] for uid, info in by_streak],
+            }
+            self.top_cache[guild_id] = cached
+        return {"version": version, "points": cached["points"], "streaks": cached["streaks"]}
+
+    def op_get_role(self, guild_id):
+        return self.roles.get(guild_id)
+
+    def op_set_role(self, guild_id, role_id):
+        self.roles[guild_id] = role_id
+        self.roles_dirty = True
+        self.unflushed += 1
+        return role_id
+
+    def op_get_zone(self, guild_id):
+        return self._zone(guild_id)
+
+    def op_set_zone(self, guild_id, zone):
+        zoneinfo.ZoneInfo(zone)  # raises for unknown zones
+        user_dict = self.currency.get(guild_id, {})
+        for user_id, record in user_dict.items():
+            self._bucket_remove(guild_id, user_id, record)
+        self.zones[guild_id] = zone
+        for user_id, record in user_dict.items():
+            self._bucket_add(guild_id, user_id, record)
+        self.zones_dirty = True
+        self.unflushed += 1
+        return zone
+
+    def execute(self, ops):
+        """
+        Applies a batch of [op, args] pairs in order. Nothing is written to disk
+        unless FLUSH_THRESHOLD writes have piled up since the last flush.
+        Returns one result per op; a failing op yields {'error': str}.
+        """
+        results = []
+        for op, args in ops:
+            handler = getattr(self, "op_" + op, None)
+            if handler is None:
+                results.append({"error": f"unknown op {op!r}"})
+                continue
+            try:
+                results.append({"ok": handler(*args)})
+            except Exception as e:
+                results.append({"error": str(e)})
+        if self.unflushed >= FLUSH_THRESHOLD:
+            self.flush()
+        return results
+
+    def op_flush(self):
+        """
+        Writes pending changes now, for readers of the CSV files such as exports.
+        """
+        self.flush()
+
+    def flush(self):
+        if self.currency_dirty:
+            save_currency_data(self.currency)
+            self.currency_dirty = False
+        if self.roles_dirty:
+            save_role_data(self.roles)
+            self.roles_dirty = False
+        if self.zones_dirty:
+            save_zone_data(self.zones)
+            self.zones_dirty = False
+        self.unflushed = 0
+
+class LocalLedger:
+    """
+    In-process ledger used when the bot runs as a single process.
+    """
+
+    def __init__(self):
+        self.ledger = None
+        self.flush_handle = None
+
+    async def request(self, op, *args):
+        if self.ledger is None:
+            self.ledger = Ledger()
+        result = self.ledger.execute([[op, list(args)]])[0]
+        if self.ledger.unflushed and self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(FLUSH_INTERVAL, self.flush)
+        if "error" in result:
+            raise LedgerError(result["error"])
+        return result["ok"]
+
+    def flush(self):
+        """
+        Writes pending changes; also call this once on shutdown.
+        """
+        self.flush_handle = None
+        if self.ledger is not None:
+            self.ledger.flush()
+
+class LedgerClient:
+    """
+    Talks to the ledger service over a Unix socket. Requests issued in the same
+    event loop iteration are coalesced into one batch (one line of JSON).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.pending = []
+        self.in_flight = {}
+        self.next_id = 0
+        self.connect_lock = asyncio.Lock()
+
+    async def _connect(self):
+        async with self.connect_lock:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path, limit=2 ** 24)
+                asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                futures = self.in_flight.pop(reply["id"], [])
+                for fut, result in zip(futures, reply["results"]):
+                    if fut.done():
+                        continue
+                    if "error" in result:
+                        fut.set_exception(LedgerError(result["error"]))
+                    else:
+                        fut.set_result(result["ok"])
+        finally:
+            self.writer = None
+            for futures in self.in_flight.values():
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(LedgerError("ledger connection lost"))
+            self.in_flight.clear()
+
+    def _flush(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        if self.writer is None:
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(LedgerError("ledger connection lost"))
+            return
+        self.next_id += 1
+        self.in_flight[self.next_id] = [fut for _, _, fut in batch]
+        payload = {"id": self.next_id, "ops": [[op, args] for op, args, _ in batch]}
+        self.writer.write(json.dumps(payload).encode() + b"\n")
+
+    async def request(self, op, *args):
+        if self.writer is None:
+            await self._connect()
+        fut = asyncio.get_running_loop().create_future()
+        if not self.pending:
+            asyncio.get_running_loop().call_soon(self._flush)
+        self.pending.append((op, list(args), fut))
+        return await fut
+
+async def serve(path):
+    """
+    Runs the ledger service until SIGINT/SIGTERM. Each connection sends one JSON
+    batch per line; batches from all workers are applied one at a time, and
+    the files are written every FLUSH_INTERVAL and on shutdown. Streaks are
+    expired here, once for the whole cluster, not by each worker.
+    """
+    ledger = Ledger()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                results = ledger.execute(request["ops"])
+                writer.write(json.dumps({"id": request["id"], "results": results}).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = await asyncio.start_unix_server(handle, path, limit=2 ** 24)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async def flush_periodically():
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            ledger.flush()
+
+    async def expire_streaks_periodically():
+        while True:
+            ledger.op_expire_streaks()
+            await asyncio.sleep(STREAK_SWEEP_INTERVAL)
+
+    print(f"Ledger service listening on {path}")
+    background = [
+        asyncio.create_task(flush_periodically()),
+        asyncio.create_task(expire_streaks_periodically()),
+    ]
+    async with server:
+        await stop.wait()
+    for task in background:
+        task.cancel()
+    ledger.flush()
+    os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DotaBot ledger service")
+    parser.add_argument("--socket", default=LEDGER_SOCKET, help="Unix socket path to listen on")
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket))
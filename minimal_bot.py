@@ -1,11 +1,17 @@
 import os
-import csv
+import time
+import asyncio
 import tempfile
-from datetime import datetime, timedelta
 import zoneinfo
+from collections import Counter
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+
+from export import export_guild
+from ledger import LocalLedger, LedgerClient
+from queues import QueueManager
+from throttle import CommandThrottle, Throttled, throttled
 
 TOKEN = os.getenv("DOTABOT_APP_ID")
 
@@ -18,104 +24,45 @@ EMOJI_CANCEL = "❌"
 
 DAILY_REWARD = 25
 
-CACHE_DIR = os.path.join(tempfile.gettempdir(), "dotabotcache")
-os.makedirs(CACHE_DIR, exist_ok=True)
-CURRENCY_FILE = os.path.join(CACHE_DIR, "currency.csv")
-ROLE_FILE = os.path.join(CACHE_DIR, "role_ids.csv")
-
-LOCAL_ZONE = zoneinfo.ZoneInfo("America/Los_Angeles")
-
-def load_currency_data():
-    """
-    Returns currency data in the format:
-    {
-      server_id: {
-        user_id: {
-          'currency': int,
-          'last_claim_date': str (YYYY-MM-DD or 'none'),
-          'streak': int
-        }
-      }
-    }
-    """
-    data = {}
-    if os.path.exists(CURRENCY_FILE):
-        with open(CURRENCY_FILE, "r", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sid = row["server_id"]
-                uid = row["user_id"]
-                if sid not in data:
-                    data[sid] = {}
-                data[sid][uid] = {
-                    "currency": int(row["currency"]),
-                    "last_claim_date": row["last_claim_date"],
-                    "streak": int(row["streak"])
-                }
-    return data
-
-def save_currency_data(data):
-    """
-    Saves the currency data dictionary to CSV.
-    """
-    with open(CURRENCY_FILE, "w", newline="") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["server_id", "user_id", "currency", "last_claim_date", "streak"]
-        )
-        writer.writeheader()
-        for server_id, user_dict in data.items():
-            for user_id, record in user_dict.items():
-                writer.writerow({
-                    "server_id": server_id,
-                    "user_id": user_id,
-                    "currency": record["currency"],
-                    "last_claim_date": record["last_claim_date"],
-                    "streak": record["streak"]
-                })
+# Throttling for commands that cost several REST calls: tokens per second and burst size
+USER_COMMAND_RATE = 1 / 10
+USER_COMMAND_BURST = 3
+GUILD_COMMAND_RATE = 1.0
+GUILD_COMMAND_BURST = 10
+THROTTLE_MAX_KEYS = 50000
 
-def load_role_data():
-    """
-    Returns a dictionary mapping server IDs to stored role IDs:
-    { server_id: role_id }
-    """
-    data = {}
-    if os.path.exists(ROLE_FILE):
-        with open(ROLE_FILE, "r", newline="") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                data[row["server_id"]] = row["role_id"]
-    return data
+# Open queues are closed automatically after this many seconds
+QUEUE_TIMEOUT = 2 * 60 * 60
+QUEUE_TICK_SECONDS = 1.0
 
-def save_role_data(data):
-    """
-    Saves the server-to-role mapping data to CSV.
-    """
-    with open(ROLE_FILE, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["server_id", "role_id"])
-        writer.writeheader()
-        for sid, rid in data.items():
-            writer.writerow({"server_id": sid, "role_id": rid})
+# Cluster mode: set by cluster.py for each worker process
+SHARD_COUNT = os.getenv("DOTABOT_SHARD_COUNT")
+SHARD_IDS = os.getenv("DOTABOT_SHARD_IDS")
+LEDGER_SOCKET = os.getenv("DOTABOT_LEDGER_SOCKET")
 
-def get_now_local():
-    """
-    Returns the current datetime in LOCAL_ZONE.
-    """
-    return datetime.now(LOCAL_ZONE)
+# Currency and role data live in the ledger service when clustered,
+# otherwise in this process
+ledger = LedgerClient(LEDGER_SOCKET) if LEDGER_SOCKET else LocalLedger()
 
-def get_today_str():
-    """
-    Returns today's date (YYYY-MM-DD) in LOCAL_ZONE.
-    """
-    return get_now_local().strftime("%Y-%m-%d")
+queue_manager = QueueManager(QUEUE_TIMEOUT, tick_seconds=QUEUE_TICK_SECONDS)
 
-def get_time_until_next_midnight():
+# Process-wide counters, shown by !metrics
+metrics = Counter()
+
+command_throttle = CommandThrottle(
+    USER_COMMAND_RATE, USER_COMMAND_BURST,
+    GUILD_COMMAND_RATE, GUILD_COMMAND_BURST,
+    max_keys=THROTTLE_MAX_KEYS
+)
+
+# guild_id -> (leaderboard version, rendered embed) for !top
+leaderboard_cache = {}
+
+def get_time_until(epoch):
     """
-    Returns (hours, minutes) until the next local midnight.
+    Returns (hours, minutes) until the given epoch time.
     """
-    now_local = get_now_local()
-    next_midnight = (now_local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-    diff = int((next_midnight - now_local).total_seconds())
+    diff = max(0, int(epoch - time.time()))
     hours, rem = divmod(diff, 3600)
     minutes, _ = divmod(rem, 60)
     return hours, minutes
@@ -131,23 +78,61 @@ reaction_thresholds = {
 
 # Create bot with all intents
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None, case_insensitive=True)
+if SHARD_COUNT and SHARD_IDS:
+    bot = commands.AutoShardedBot(
+        command_prefix="!",
+        intents=intents,
+        help_command=None,
+        case_insensitive=True,
+        shard_count=int(SHARD_COUNT),
+        shard_ids=[int(s) for s in SHARD_IDS.split(",")]
+    )
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents, help_command=None, case_insensitive=True)
 
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} in {len(bot.guilds)} server(s).")
     for guild in bot.guilds:
         print(f"- {guild.name} (ID: {guild.id})")
+    if not expire_queues.is_running():
+        expire_queues.start()
+    # The clustered ledger service runs this sweep itself, once for all workers
+    if isinstance(ledger, LocalLedger) and not expire_streaks.is_running():
+        expire_streaks.start()
+
+@tasks.loop(seconds=QUEUE_TICK_SECONDS)
+async def expire_queues():
+    """
+    Advances the queue timer wheel and closes queues whose deadline passed.
+    """
+    for entry in queue_manager.tick():
+        await close_queue_message(entry, "expired")
+
+@tasks.loop(minutes=1)
+async def expire_streaks():
+    """
+    Resets streaks that missed yesterday's claim. Guilds hit midnight at
+    different times, so this runs every minute; the ledger only does work
+    for zones whose midnight just passed.
+    """
+    metrics["streaks_expired"] += await ledger.request("expire_streaks")
+
+@bot.event
+async def on_command_error(ctx, error):
+    # Shed commands are dropped silently; replying would spend the REST calls we are saving
+    if isinstance(error, Throttled):
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
 
 @bot.event
 async def on_guild_join(guild):
     """
     Automatically create or find the 'queue' role when the bot joins a new server.
     """
-    roles_data = load_role_data()
     guild_id = str(guild.id)
 
-    existing_role_id = roles_data.get(guild_id)
+    existing_role_id = await ledger.request("get_role", guild_id)
     role_obj = None
 
     if existing_role_id:
@@ -156,22 +141,50 @@ async def on_guild_join(guild):
     # If the role doesn't exist, create a new one
     if not role_obj:
         role_obj = await guild.create_role(name="queue", mentionable=True)
-        roles_data[guild_id] = str(role_obj.id)
-        save_role_data(roles_data)
+        await ledger.request("set_role", guild_id, str(role_obj.id))
 
     print(f"'queue' role setup complete in guild: {guild.name} (ID: {guild.id}).")
 
 @bot.event
 async def on_reaction_add(reaction, user):
     """
-    Automatically sends a new message if the threshold for reactions is met.
+    Sends the participant list once an open queue hits its threshold,
+    and closes the queue when its creator (or a moderator) reacts with ❌.
     """
     if reaction.message.author.id != bot.user.id or user.bot:
         return
 
-    threshold, header_title = reaction_thresholds.get(str(reaction.emoji), (None, None))
-    if threshold and reaction.count == threshold:
-        await send_reply_msg(header_title, reaction)
+    # Only queues that are still open react to anything
+    entry = queue_manager.get(reaction.message.id)
+    if entry is None:
+        return
+
+    mode = str(reaction.emoji)
+    if mode == EMOJI_CANCEL:
+        if user.id == entry.creator_id or reaction.message.channel.permissions_for(user).manage_messages:
+            queue_manager.close(entry.message_id)
+            await close_queue_message(entry, "cancelled")
+        return
+
+    if mode == entry.mode and reaction.count == entry.threshold:
+        await send_reply_msg(reaction_thresholds[mode][1], reaction)
+
+async def close_queue_message(entry, reason):
+    """
+    Edits a closed queue's embed so it no longer invites reactions.
+    """
+    channel = bot.get_channel(entry.channel_id)
+    if channel is None:
+        return
+    embed = discord.Embed(
+        title=entry.title,
+        description=f"This queue has {reason}.",
+        color=discord.Color.dark_grey()
+    )
+    try:
+        await channel.get_partial_message(entry.message_id).edit(embed=embed)
+    except discord.HTTPException:
+        pass
 
 async def send_reply_msg(header_msg, reaction):
     """
@@ -192,21 +205,24 @@ async def send_queue_embed(ctx, title_template, emoji, color=discord.Color.purpl
     """
     Sends a queue embed, reacts with the specified emoji, and mentions the @queue role.
     """
-    roles_data = load_role_data()
     guild_id = str(ctx.guild.id)
-    role_id = roles_data.get(guild_id)
+    role_id = await ledger.request("get_role", guild_id)
 
     role_obj = None
     if role_id:
         role_obj = discord.utils.get(ctx.guild.roles, id=int(role_id))
 
     sender = ctx.author.display_name
+    title = title_template.format(sender=sender)
     embed = discord.Embed(
-        title=title_template.format(sender=sender),
+        title=title,
         description="React to join",
         color=color
     )
     msg = await ctx.send(embed=embed)
+    queue_manager.open(
+        msg.id, msg.channel.id, ctx.guild.id, emoji, title, ctx.author.id, reaction_thresholds[emoji][0]
+    )
     await msg.add_reaction(emoji)
     await msg.add_reaction(EMOJI_CANCEL)
 
@@ -232,7 +248,9 @@ async def help(ctx):
             "`!my` - See your points\n"
             "`!top` - Streak and point leaderboard\n\n"
             "**Role Command**\n"
-            "`!role` - Assign yourself with the queue role\n"
+            "`!role` - Assign yourself with the queue role\n\n"
+            "**Server Settings**\n"
+            "`!timezone [zone]` - Show or set the timezone for daily resets\n"
         ),
         color=discord.Color.green()
     )
@@ -244,8 +262,7 @@ async def role(ctx):
     Create or find a 'queue' role, store its ID, and assign it to the user.
     """
     guild_id = str(ctx.guild.id)
-    roles_data = load_role_data()
-    existing_role_id = roles_data.get(guild_id)
+    existing_role_id = await ledger.request("get_role", guild_id)
 
     role_obj = None
     if existing_role_id:
@@ -254,29 +271,57 @@ async def role(ctx):
     # Create if not found
     if not role_obj:
         role_obj = await ctx.guild.create_role(name="queue", mentionable=True)
-        roles_data[guild_id] = str(role_obj.id)
-        save_role_data(roles_data)
+        await ledger.request("set_role", guild_id, str(role_obj.id))
 
     await ctx.author.add_roles(role_obj)
     await ctx.send(f"{ctx.author.mention} was assigned to {role_obj.mention}.")
 
+@bot.command(aliases=["tz"])
+async def timezone(ctx, zone=None):
+    """
+    Shows the server's daily reset timezone, or sets it (requires Manage Server).
+    """
+    guild_id = str(ctx.guild.id)
+    if zone is None:
+        current = await ledger.request("get_zone", guild_id)
+        await ctx.send(f"Daily rewards reset at midnight in **{current}**.")
+        return
+
+    if not ctx.author.guild_permissions.manage_guild:
+        await ctx.send(f"{ctx.author.mention}, you need Manage Server to change the timezone.")
+        return
+
+    try:
+        zoneinfo.ZoneInfo(zone)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        await ctx.send(f"Unknown timezone `{zone}`. Use an IANA name like `Europe/Berlin`.")
+        return
+
+    await ledger.request("set_zone", guild_id, zone)
+    await ctx.send(f"Daily rewards now reset at midnight in **{zone}**.")
+
 @bot.command(aliases=["q", "u"])
+@throttled(command_throttle, metrics)
 async def queue(ctx):
     await send_queue_embed(ctx, "⚔️ Unranked Queue started by {sender} ⚔️", EMOJI_QUEUE)
 
 @bot.command(aliases=["r"])
+@throttled(command_throttle, metrics)
 async def ranked(ctx):
     await send_queue_embed(ctx, "📈 Ranked Queue started by {sender} 📈", EMOJI_RANKED)
 
 @bot.command(aliases=["t"])
+@throttled(command_throttle, metrics)
 async def turbo(ctx):
     await send_queue_embed(ctx, "⏩ Turbo Queue by {sender} ⏩", EMOJI_TURBO)
 
 @bot.command(aliases=["bc"])
+@throttled(command_throttle, metrics)
 async def battlecup(ctx):
     await send_queue_embed(ctx, "🏆 Battle Cup Queue started by {sender} 🏆", EMOJI_BC)
 
 @bot.command(aliases=["ih"])
+@throttled(command_throttle, metrics)
 async def inhouse(ctx):
     await send_queue_embed(ctx, "🏠 Inhouse started by {sender} 🏠", EMOJI_IH)
 
@@ -287,45 +332,19 @@ async def daily(ctx):
     """
     guild_id = str(ctx.guild.id)
     user_id = str(ctx.author.id)
-    data = load_currency_data()
-
-    if guild_id not in data:
-        data[guild_id] = {}
-    if user_id not in data[guild_id]:
-        data[guild_id][user_id] = {
-            "currency": 0,
-            "last_claim_date": "none",
-            "streak": 0
-        }
-
-    record = data[guild_id][user_id]
-    today = get_today_str()
-
-    # Check if daily is already claimed today
-    if record["last_claim_date"] == today:
-        hours, minutes = get_time_until_next_midnight()
+
+    # The ledger checks today's claim (in the guild's timezone) and updates the streak in one step
+    result = await ledger.request("claim_daily", guild_id, user_id, DAILY_REWARD)
+    record = result["record"]
+
+    if not result["claimed"]:
+        hours, minutes = get_time_until(result["next_midnight"])
         await ctx.send(
             f"{ctx.author.mention}, you've already claimed your daily. "
             f"Try again in **{hours}h {minutes}m**"
         )
         return
 
-    # Update streak
-    if record["last_claim_date"] != "none":
-        prev = datetime.strptime(record["last_claim_date"], "%Y-%m-%d").date()
-        curr = datetime.strptime(today, "%Y-%m-%d").date()
-        if (curr - prev).days == 1:
-            record["streak"] += 1
-        else:
-            record["streak"] = 1
-    else:
-        record["streak"] = 1
-
-    # Update currency and save
-    record["last_claim_date"] = today
-    record["currency"] += DAILY_REWARD
-    save_currency_data(data)
-
     await ctx.send(
         f"{ctx.author.mention}, daily reward claimed! "
         f"You now have **{record['currency']}🔸** ({record['streak']} day streak)"
@@ -338,45 +357,49 @@ async def my(ctx):
     """
     guild_id = str(ctx.guild.id)
     user_id = str(ctx.author.id)
-    data = load_currency_data()
-    record = data.get(guild_id, {}).get(user_id, {"currency": 0})
+    record = await ledger.request("get", guild_id, user_id)
 
     await ctx.send(
         f"{ctx.author.mention}, you have **{record['currency']}🔸**"
     )
 
 @bot.command()
+@throttled(command_throttle, metrics)
 async def top(ctx):
     """
     Shows a leaderboard of top 10 points and top 10 streaks.
     """
     guild_id = str(ctx.guild.id)
-    data = load_currency_data()
-    server_data = data.get(guild_id, {})
+    cached = leaderboard_cache.get(guild_id)
+    leaders = await ledger.request("top", guild_id, 10, cached[0] if cached else None)
 
-    if not server_data:
-        await ctx.send("No data available for this server.")
+    # Nothing in the top 10 changed since the last render
+    if cached and leaders["version"] == cached[0]:
+        metrics["leaderboard_cache_hits"] += 1
+        await ctx.send(embed=cached[1])
         return
+    metrics["leaderboard_cache_misses"] += 1
 
-    sorted_by_points = sorted(server_data.items(), key=lambda x: x[1]["currency"], reverse=True)
-    sorted_by_streak = sorted(server_data.items(), key=lambda x: x[1]["streak"], reverse=True)
+    top_points = leaders["points"]
+    top_streaks = leaders["streaks"]
 
-    top_points = sorted_by_points[:10]
-    top_streaks = sorted_by_streak[:10]
+    if not top_points:
+        await ctx.send("No data available for this server.")
+        return
 
     # Generate points list
     points_desc = ""
-    for i, (user_id, info) in enumerate(top_points, start=1):
+    for i, (user_id, currency) in enumerate(top_points, start=1):
         member = ctx.guild.get_member(int(user_id))
         name = member.display_name if member else f"User {user_id}"
-        points_desc += f"{i}. {name} — **{info['currency']}🔸**\n"
+        points_desc += f"{i}. {name} — **{currency}🔸**\n"
 
     # Generate streak list
     streak_desc = ""
-    for i, (user_id, info) in enumerate(top_streaks, start=1):
+    for i, (user_id, streak) in enumerate(top_streaks, start=1):
         member = ctx.guild.get_member(int(user_id))
         name = member.display_name if member else f"User {user_id}"
-        streak_desc += f"{i}. {name} — **{info['streak']} 🔥**\n"
+        streak_desc += f"{i}. {name} — **{streak} 🔥**\n"
 
     embed = discord.Embed(title="Leaderboard", color=discord.Color.gold())
     if points_desc:
@@ -384,6 +407,84 @@ async def top(ctx):
     if streak_desc:
         embed.add_field(name="Top Streaks", value=streak_desc, inline=False)
 
+    leaderboard_cache[guild_id] = (leaders["version"], embed)
+    await ctx.send(embed=embed)
+
+def write_guild_export(guild_id, fmt):
+    """
+    Streams the guild's records into a temp file. Returns (path, summary).
+    """
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=f".{fmt}", newline="", encoding="utf-8", delete=False
+    ) as out:
+        summary = export_guild(guild_id, out, fmt)
+    return out.name, summary
+
+def format_guild_stats(summary):
+    streaks = ", ".join(f"{label}: {count}" for label, count in summary["streaks"].items())
+    return (
+        f"**Users**: {summary['users']}\n"
+        f"**Active this week**: {summary['active_users']}\n"
+        f"**Total points**: {summary['total_points']}🔸\n"
+        f"**Streaks**: {streaks}"
+    )
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def export(ctx, fmt="csv"):
+    """
+    Uploads this server's points as CSV or JSON Lines (admins only).
+    """
+    fmt = fmt.lower()
+    if fmt not in ("csv", "jsonl"):
+        await ctx.send("Usage: `!export [csv|jsonl]`")
+        return
+
+    # Pending ledger writes go to disk first so the export is current.
+    # File I/O runs off the event loop; memory stays flat however big the store is
+    await ledger.request("flush")
+    path, summary = await asyncio.to_thread(write_guild_export, str(ctx.guild.id), fmt)
+    try:
+        await ctx.send(
+            format_guild_stats(summary),
+            file=discord.File(path, filename=f"points-{ctx.guild.id}.{fmt}")
+        )
+    except discord.HTTPException:
+        await ctx.send("The export is too large to upload here. Use `python export.py` on the host.")
+    finally:
+        os.remove(path)
+
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def serverstats(ctx):
+    """
+    Shows active claimers, total points and the streak distribution (admins only).
+    """
+    await ledger.request("flush")
+    summary = await asyncio.to_thread(export_guild, str(ctx.guild.id))
+    embed = discord.Embed(title="Server Stats", description=format_guild_stats(summary), color=discord.Color.gold())
+    await ctx.send(embed=embed)
+
+@bot.command(name="metrics")
+@commands.has_permissions(administrator=True)
+async def show_metrics(ctx):
+    """
+    Shows this process's counters and cache hit rates (admins only).
+    """
+    lines = [f"`{name}`: {value}" for name, value in sorted(metrics.items())]
+
+    lines.append(f"`throttle_tracked_keys`: {len(command_throttle.users) + len(command_throttle.guilds)}")
+
+    lookups = metrics["leaderboard_cache_hits"] + metrics["leaderboard_cache_misses"]
+    if lookups:
+        hit_rate = metrics["leaderboard_cache_hits"] / lookups
+        lines.append(f"`leaderboard_cache_hit_rate`: {hit_rate:.1%}")
+
+    embed = discord.Embed(
+        title="Metrics",
+        description="\n".join(lines) if lines else "No metrics recorded yet.",
+        color=discord.Color.dark_grey()
+    )
     await ctx.send(embed=embed)
 
 # Optional: If you'd like to keep this command but exclude it from !help,
@@ -398,3 +499,6 @@ async def trivia(ctx):
 # Entry point for running the bot
 if __name__ == "__main__":
     bot.run(TOKEN)
+    # The clustered ledger service flushes itself on shutdown
+    if isinstance(ledger, LocalLedger):
+        ledger.flush()
@@ -0,0 +1,106 @@
+import time
+
+class TimerWheel:
+    """
+    Hashed timer wheel. Timers hash into `slots` buckets by expiry tick, so
+    scheduling and cancelling are O(1) and each tick only visits one bucket.
+    Timers further out than one revolution carry a remaining-rounds count.
+    """
+
+    def __init__(self, tick_seconds=1.0, slots=512):
+        self.tick_seconds = tick_seconds
+        self.slots = [dict() for _ in range(slots)]
+        self.cursor = 0
+        # key -> slot index, for O(1) cancel
+        self.index = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def schedule(self, key, delay):
+        """
+        Fires `key` after `delay` seconds (rounded up to whole ticks). Rescheduling replaces the old timer.
+        """
+        self.cancel(key)
+        ticks = max(1, -(-int(delay * 1000) // int(self.tick_seconds * 1000)))
+        rounds, offset = divmod(ticks - 1, len(self.slots))
+        slot = (self.cursor + 1 + offset) % len(self.slots)
+        self.slots[slot][key] = rounds
+        self.index[key] = slot
+
+    def cancel(self, key):
+        slot = self.index.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def tick(self):
+        """
+        Advances one tick and returns the keys that expired.
+        """
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        bucket = self.slots[self.cursor]
+        expired = []
+        for key, rounds in bucket.items():
+            if rounds == 0:
+                expired.append(key)
+            else:
+                bucket[key] = rounds - 1
+        for key in expired:
+            del bucket[key]
+            del self.index[key]
+        return expired
+
+class ActiveQueue:
+    """
+    State for one open queue message.
+    """
+    __slots__ = ("message_id", "channel_id", "guild_id", "mode", "title", "creator_id", "threshold", "deadline")
+
+    def __init__(self, message_id, channel_id, guild_id, mode, title, creator_id, threshold, deadline):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.mode = mode
+        self.title = title
+        self.creator_id = creator_id
+        self.threshold = threshold
+        self.deadline = deadline
+
+class QueueManager:
+    """
+    Tracks open queues by message id and closes them when their deadline passes.
+    Call `tick()` once per `wheel.tick_seconds`.
+    """
+
+    def __init__(self, timeout, tick_seconds=1.0):
+        self.timeout = timeout
+        self.wheel = TimerWheel(tick_seconds=tick_seconds)
+        self.queues = {}
+
+    def __len__(self):
+        return len(self.queues)
+
+    def open(self, message_id, channel_id, guild_id, mode, title, creator_id, threshold):
+        entry = ActiveQueue(
+            message_id, channel_id, guild_id, mode, title, creator_id, threshold,
+            time.time() + self.timeout
+        )
+        self.queues[message_id] = entry
+        self.wheel.schedule(message_id, self.timeout)
+        return entry
+
+    def get(self, message_id):
+        return self.queues.get(message_id)
+
+    def close(self, message_id):
+        """
+        Drops all state for the queue and returns it, or None if it was not open.
+        """
+        self.wheel.cancel(message_id)
+        return self.queues.pop(message_id, None)
+
+    def tick(self):
+        """
+        Advances the wheel and returns the queues that just expired (already removed).
+        """
+        return [self.queues.pop(message_id) for message_id in self.wheel.tick()]
@@ -0,0 +1,577 @@
+"""
+Soak test: runs a bot against a local fake Discord gateway/REST server (and a
+fake OpenDota API) for a long time, driving it with synthetic commands and
+reactions. Every sample interval it records tracemalloc totals and the size of
+each bot-owned cache, and it fails if any of them exceed their bound.
+
+    python soak.py --bot bot --duration 14400 --rate 5 --sample 60
+    python soak.py --bot minimal_bot --duration 600 --guilds 20 --bound leaderboard_cache=50
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import importlib
+import threading
+import tracemalloc
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+BOT_USER_ID = 900000000000000001
+# Guild k has id GUILD_ID_BASE + 2k and one text channel with the next id
+GUILD_ID_BASE = 900000000000000100
+USER_ID_BASE = 800000000000000000
+
+# Cache name -> max size allowed at any sample; override with --bound name=value.
+# Caches that are capped by construction (discord.py's message deque, the
+# card LRU) are reported by count but bounded by traced memory (*_kb), since
+# their count can never go over the cap.
+DEFAULT_BOUNDS = {
+    "discord_message_kb": 16384,
+    "pending_wait_for": 200,
+    "used_match_ids": 2000,
+    "match_cache": 1000,
+    "open_queues": 5000,
+    "queue_timers": 5000,
+    "open_trivia_rounds": 100,
+    "inhouse_parties": 10000,
+    "rendered_cards_kb": 32768,
+    "card_renders_in_flight": 50,
+    "avatar_fetches": 1000,
+    "throttle_keys": 100000,
+    "guild_configs_cached": 10000,
+    "leaderboard_cache": 10000,
+    "ledger_top_cache": 10000,
+    "ledger_claim_buckets": 1000,
+    "ledger_clock_zones": 600,
+}
+
+# (weight, content) for synthetic commands. {member} becomes a random member
+# mention; !config is sent by the guild owner so the admin check passes.
+# Commands the bot under test doesn't have are skipped.
+COMMANDS = [
+    (6, "!q"), (3, "!ih"), (2, "!t"), (2, "!r"),
+    (5, "!top"), (4, "!d"), (3, "!mmr"), (3, "!my"),
+    (6, "!trivia"), (2, "!trivia open"), (2, "!hero am"), (1, "!hero shadw fend"),
+    (2, "!party {member} {member}"), (1, "!party"),
+    (1, "!config threshold Ranked 5"), (1, "!config reward 30"),
+    (1, "!config disable turbo"), (1, "!config enable turbo"), (1, "!config addmode scrim 🎮 4"),
+]
+
+# Modules whose allocations make up discord.py's cached Message objects
+MESSAGE_MODULES = ("/discord/message.py", "/discord/embeds.py", "/discord/reaction.py")
+
+def make_avatar_png():
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64), (88, 101, 242)).save(out, format="PNG")
+    return out.getvalue()
+
+# Served for every default avatar the bot downloads for image cards
+PNG_AVATAR = make_avatar_png()
+
+def user_payload(user_id, bot=False):
+    return {
+        "id": str(user_id),
+        "username": "bot" if bot else f"user{user_id - USER_ID_BASE}",
+        "discriminator": "0",
+        "global_name": None,
+        "avatar": None,
+        "bot": bot,
+    }
+
+def member_payload(user_id):
+    return {
+        "user": user_payload(user_id),
+        "roles": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+def emoji_payload(text):
+    """
+    Parses a URL/emoji string ("⚔️" or "immortal:123") into gateway emoji data.
+    """
+    text = text.strip("<>").lstrip(":")
+    if ":" in text:
+        name, emoji_id = text.split(":", 1)
+        return {"id": emoji_id, "name": name}
+    return {"id": None, "name": text}
+
+def emoji_text(emoji):
+    return f"{emoji['name']}:{emoji['id']}" if emoji["id"] else emoji["name"]
+
+def json_response(data, status=200):
+    # discord.py only decodes bodies whose content type is exactly application/json
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={"Content-Type": "application/json"})
+
+class FakeDiscord:
+    """
+    Just enough of Discord's gateway and REST API for the bots in this repo,
+    plus the two OpenDota endpoints bot.py uses. Runs on its own thread and
+    event loop so blocking `requests` calls in the bot cannot deadlock it.
+    """
+
+    def __init__(self, users, guilds, rate, seed):
+        self.users = [USER_ID_BASE + i for i in range(1, users + 1)]
+        # (guild_id, channel_id) per guild; users[0] owns them all
+        self.guilds = [(GUILD_ID_BASE + 2 * k, GUILD_ID_BASE + 2 * k + 1) for k in range(guilds)]
+        self.channel_guild = {channel_id: guild_id for guild_id, channel_id in self.guilds}
+        self.commands = COMMANDS
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.next_id = 10 ** 18
+        self.sequence = 0
+        self.ws = None
+        self.loop = None
+        self.port = None
+        self.ready = threading.Event()
+        self.stopping = False
+        # message_id -> {'data': message json, 'reactions': {emoji_text: [user_id]}}
+        self.messages = {}
+        # Recent bot message ids that users may react to
+        self.recent = []
+        self.events_sent = 0
+
+    def snowflake(self):
+        self.next_id += 1
+        return self.next_id
+
+    # ---------- gateway ----------
+
+    async def dispatch(self, event, data):
+        if self.ws is None or self.ws.closed:
+            return
+        self.sequence += 1
+        await self.ws.send_str(json.dumps({"op": 0, "t": event, "s": self.sequence, "d": data}))
+        self.events_sent += 1
+
+    def guild_payload(self, guild_id, channel_id):
+        return {
+            "id": str(guild_id),
+            "name": f"Soak Guild {(guild_id - GUILD_ID_BASE) // 2}",
+            "icon": None,
+            "owner_id": str(self.users[0]),
+            "roles": [{
+                "id": str(guild_id), "name": "@everyone", "permissions": "0", "color": 0,
+                "hoist": False, "position": 0, "managed": False, "mentionable": False, "flags": 0,
+            }],
+            "channels": [{
+                "id": str(channel_id), "type": 0, "name": "general", "position": 0,
+                "permission_overwrites": [], "guild_id": str(guild_id),
+            }],
+            "members": [member_payload(uid) for uid in self.users] + [{
+                "user": user_payload(BOT_USER_ID, bot=True), "roles": [],
+                "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0,
+            }],
+            "member_count": len(self.users) + 1,
+            "large": False,
+            "unavailable": False,
+            "emojis": [], "stickers": [], "features": [], "threads": [], "presences": [],
+            "voice_states": [], "stage_instances": [], "guild_scheduled_events": [],
+            "premium_tier": 0, "verification_level": 0, "default_message_notifications": 0,
+            "explicit_content_filter": 0, "mfa_level": 0, "nsfw_level": 0,
+            "afk_timeout": 300, "system_channel_flags": 0, "preferred_locale": "en-US",
+        }
+
+    async def gateway(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.ws = ws
+        await ws.send_str(json.dumps({"op": 10, "d": {"heartbeat_interval": 41250}}))
+        async for msg in ws:
+            payload = json.loads(msg.data)
+            if payload["op"] == 1:
+                await ws.send_str(json.dumps({"op": 11}))
+            elif payload["op"] == 2:
+                await self.dispatch("READY", {
+                    "v": 10,
+                    "user": user_payload(BOT_USER_ID, bot=True),
+                    "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id, _ in self.guilds],
+                    "session_id": "soak",
+                    "resume_gateway_url": f"ws://127.0.0.1:{self.port}/",
+                    "application": {"id": str(BOT_USER_ID), "flags": 0},
+                })
+                for guild_id, channel_id in self.guilds:
+                    await self.dispatch("GUILD_CREATE", self.guild_payload(guild_id, channel_id))
+                self.ready.set()
+        return ws
+
+    # ---------- REST ----------
+
+    def message_payload(self, message_id, channel_id, author_id, content, embeds=(), bot=False):
+        data = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "guild_id": str(self.channel_guild[channel_id]),
+            "author": user_payload(author_id, bot=bot),
+            "content": content,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": list(embeds), "pinned": False, "type": 0, "flags": 0,
+        }
+        if not bot:
+            data["member"] = {k: v for k, v in member_payload(author_id).items() if k != "user"}
+        return data
+
+    def reaction_list(self, message_id):
+        reactions = []
+        for text, user_ids in self.messages[message_id]["reactions"].items():
+            if user_ids:
+                reactions.append({
+                    "emoji": emoji_payload(text), "count": len(user_ids), "me": BOT_USER_ID in user_ids,
+                    "me_burst": False, "burst_colors": [],
+                    "count_details": {"normal": len(user_ids), "burst": 0},
+                })
+        return reactions
+
+    async def create_message(self, request):
+        if request.content_type.startswith("multipart/"):
+            body = {}
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == "payload_json":
+                    body = json.loads(await part.text())
+        else:
+            body = await request.json()
+        message_id = self.snowflake()
+        channel_id = int(request.match_info["channel_id"])
+        data = self.message_payload(
+            message_id, channel_id, BOT_USER_ID, body.get("content") or "", body.get("embeds") or (), bot=True
+        )
+        self.messages[message_id] = {"data": data, "reactions": {}}
+        self.recent.append(message_id)
+        # Keep only what the driver needs; the bot's own caches are what we measure
+        if len(self.recent) > 50:
+            old = self.recent.pop(0)
+            self.messages.pop(old, None)
+        await self.dispatch("MESSAGE_CREATE", data)
+        return json_response(data)
+
+    async def get_message(self, request):
+        message_id = int(request.match_info["message_id"])
+        entry = self.messages.get(message_id)
+        if entry is None:
+            return json_response({"message": "Unknown Message", "code": 10008}, status=404)
+        return json_response(dict(entry["data"], reactions=self.reaction_list(message_id)))
+
+    async def edit_message(self, request):
+        message_id = int(request.match_info["message_id"])
+        entry = self.messages.get(message_id)
+        if entry is None:
+            return json_response({"message": "Unknown Message", "code": 10008}, status=404)
+        body = await request.json()
+        entry["data"]["embeds"] = body.get("embeds", entry["data"]["embeds"])
+        return json_response(entry["data"])
+
+    async def add_own_reaction(self, request):
+        await self.react(int(request.match_info["message_id"]), request.match_info["emoji"], BOT_USER_ID)
+        return web.Response(status=204)
+
+    async def reaction_users(self, request):
+        message_id = int(request.match_info["message_id"])
+        entry = self.messages.get(message_id)
+        text = emoji_text(emoji_payload(request.match_info["emoji"]))
+        user_ids = entry["reactions"].get(text, []) if entry else []
+        after = int(request.query.get("after", 0))
+        users = [user_payload(uid, bot=(uid == BOT_USER_ID)) for uid in user_ids if uid > after]
+        return json_response(users[:int(request.query.get("limit", 100))])
+
+    async def default_avatar(self, request):
+        if PNG_AVATAR is None:
+            return json_response({"message": "Not emulated", "code": 0}, status=404)
+        return web.Response(body=PNG_AVATAR, headers={"Content-Type": "image/png"})
+
+    async def get_me(self, request):
+        return json_response(user_payload(BOT_USER_ID, bot=True))
+
+    async def application_info(self, request):
+        return json_response({
+            "id": str(BOT_USER_ID), "name": "soak", "description": "", "icon": None,
+            "bot_public": False, "bot_require_code_grant": False, "verify_key": "",
+            "owner": user_payload(self.users[0]), "flags": 0,
+        })
+
+    async def fallback(self, request):
+        if request.method in ("PUT", "DELETE", "PATCH"):
+            return web.Response(status=204)
+        return json_response({"message": "Not emulated", "code": 0}, status=404)
+
+    # ---------- OpenDota ----------
+
+    async def hero_stats(self, request):
+        names = ["Anti-Mage", "Windranger", "Shadow Fiend", "Pudge", "Crystal Maiden", "Axe", "Sniper", "Lina"]
+        heroes = []
+        for i, name in enumerate(names, start=1):
+            heroes.append({
+                "id": i, "localized_name": name, "name": "npc_dota_hero_" + name.lower().replace(" ", "_"),
+                "img": f"/apps/dota2/images/dota_react/heroes/{i}.png?", "base_health": 120 + i,
+                "base_armor": i, "move_speed": 280 + i * 5, "attack_range": 150 + i * 50,
+            })
+        return json_response(heroes)
+
+    async def public_matches(self, request):
+        matches = []
+        for _ in range(100):
+            picks = self.random.sample(range(1, 9), 8) + [1, 2]
+            matches.append({
+                "match_id": self.snowflake(), "radiant_win": self.random.random() < 0.5,
+                "duration": self.random.randint(900, 3600),
+                "radiant_team": picks[:5], "dire_team": picks[5:],
+            })
+        return json_response(matches)
+
+    # ---------- synthetic load ----------
+
+    async def react(self, message_id, emoji, user_id, add=True):
+        entry = self.messages.get(message_id)
+        if entry is None:
+            return
+        emoji_data = emoji_payload(emoji)
+        user_ids = entry["reactions"].setdefault(emoji_text(emoji_data), [])
+        if add == (user_id in user_ids):
+            return
+        if add:
+            user_ids.append(user_id)
+        else:
+            user_ids.remove(user_id)
+        data = {
+            "user_id": str(user_id), "channel_id": entry["data"]["channel_id"], "message_id": str(message_id),
+            "guild_id": entry["data"]["guild_id"], "emoji": emoji_data, "burst": False, "type": 0,
+        }
+        if add and user_id != BOT_USER_ID:
+            data["member"] = member_payload(user_id)
+        elif add:
+            data["member"] = {
+                "user": user_payload(BOT_USER_ID, bot=True), "roles": [],
+                "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0,
+            }
+        await self.dispatch("MESSAGE_REACTION_ADD" if add else "MESSAGE_REACTION_REMOVE", data)
+
+    async def drive(self):
+        commands = [c for weight, c in self.commands for _ in range(weight)]
+        while not self.stopping:
+            await asyncio.sleep(self.random.expovariate(self.rate))
+            user_id = self.random.choice(self.users)
+            roll = self.random.random()
+            if roll < 0.4 or not self.recent:
+                content = self.random.choice(commands)
+                while "{member}" in content:
+                    content = content.replace("{member}", f"<@{self.random.choice(self.users)}>", 1)
+                if content.startswith("!config"):
+                    user_id = self.users[0]
+                _, channel_id = self.random.choice(self.guilds)
+                data = self.message_payload(self.snowflake(), channel_id, user_id, content)
+                await self.dispatch("MESSAGE_CREATE", data)
+            else:
+                # React to (or un-react from) one of the bot's recent messages with an emoji it offered
+                message_id = self.random.choice(self.recent)
+                entry = self.messages.get(message_id)
+                offered = [t for t, ids in entry["reactions"].items() if BOT_USER_ID in ids] if entry else []
+                if offered:
+                    await self.react(message_id, self.random.choice(offered), user_id, add=roll < 0.93)
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        started = threading.Event()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            app = web.Application()
+            app.router.add_get("/", self.gateway)
+            app.router.add_get("/api/heroStats", self.hero_stats)
+            app.router.add_get("/api/publicMatches", self.public_matches)
+            app.router.add_get("/embed/avatars/{index}", self.default_avatar)
+            api = "/api/v{version}"
+            app.router.add_get(api + "/users/@me", self.get_me)
+            app.router.add_get(api + "/oauth2/applications/@me", self.application_info)
+            app.router.add_post(api + "/channels/{channel_id}/messages", self.create_message)
+            app.router.add_get(api + "/channels/{channel_id}/messages/{message_id}", self.get_message)
+            app.router.add_patch(api + "/channels/{channel_id}/messages/{message_id}", self.edit_message)
+            app.router.add_put(api + "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me", self.add_own_reaction)
+            app.router.add_get(api + "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}", self.reaction_users)
+            app.router.add_route("*", "/{tail:.*}", self.fallback)
+            runner = web.AppRunner(app)
+            self.loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            self.loop.run_until_complete(site.start())
+            self.port = site._server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+
+    def start_driving(self):
+        asyncio.run_coroutine_threadsafe(self.drive(), self.loop)
+
+def traced_message_kb():
+    """
+    Memory currently allocated by code in MESSAGE_MODULES (by innermost frame).
+    """
+    stats = tracemalloc.take_snapshot().statistics("filename")
+    return sum(stat.size for stat in stats if stat.traceback[0].filename.endswith(MESSAGE_MODULES)) // 1024
+
+def cache_probes(module):
+    """
+    Returns {name: fn() -> size} for every known cache the bot module has.
+    Globals are looked up at sample time since some are reassigned.
+    """
+    bot = module.bot
+    probes = {
+        "discord_message_cache": lambda: len(bot._connection._messages or ()),
+        "discord_message_kb": traced_message_kb,
+        "pending_wait_for": lambda: sum(len(listeners) for listeners in bot._listeners.values()),
+    }
+    optional = {
+        "used_match_ids": lambda: len(module.used_match_ids),
+        "match_cache": lambda: len(module.match_cache),
+        "open_queues": lambda: len(module.queue_manager),
+        "queue_timers": lambda: len(module.queue_manager.wheel),
+        "open_trivia_rounds": lambda: len(module.open_trivia_rounds),
+        "inhouse_parties": lambda: len(module.inhouse_parties),
+        "rendered_cards": lambda: len(module.card_renderer.cache),
+        "rendered_cards_kb": lambda: sum(len(png) for png in module.card_renderer.cache.values()) // 1024,
+        "card_renders_in_flight": lambda: len(module.card_renderer.in_flight),
+        "avatar_fetches": lambda: len(module.avatar_fetches),
+        "throttle_keys": lambda: len(module.command_throttle.users) + len(module.command_throttle.guilds),
+        "guild_configs_cached": lambda: len(module.guild_configs.cache),
+        "leaderboard_cache": lambda: len(module.leaderboard_cache),
+        # minimal_bot's in-process ledger is created on first use
+        "ledger_top_cache": lambda: len(module.ledger.ledger.top_cache) if module.ledger.ledger else 0,
+        "ledger_claim_buckets": lambda: len(module.ledger.ledger.claim_buckets) if module.ledger.ledger else 0,
+        "ledger_clock_zones": lambda: len(module.ledger.ledger.clock.zones) if module.ledger.ledger else 0,
+    }
+    for name, probe in optional.items():
+        try:
+            probe()
+        except AttributeError:
+            continue
+        probes[name] = probe
+    return probes
+
+def parse_bounds(items):
+    bounds = dict(DEFAULT_BOUNDS)
+    for item in items:
+        name, _, value = item.partition("=")
+        bounds[name] = int(value)
+    return bounds
+
+async def soak(module, fake, args, bounds):
+    probes = cache_probes(module)
+    print(f"Tracking: {', '.join(sorted(probes))}")
+    bot_task = asyncio.create_task(module.bot.start("soak-token"))
+
+    while not fake.ready.is_set():
+        if bot_task.done():
+            bot_task.result()
+        await asyncio.sleep(0.1)
+    await module.bot.wait_until_ready()
+    fake.commands = [
+        (weight, content) for weight, content in COMMANDS
+        if module.bot.get_command(content[1:].split()[0])
+    ]
+    fake.start_driving()
+
+    first_snapshot = tracemalloc.take_snapshot()
+    baseline, _ = tracemalloc.get_traced_memory()
+    started = time.monotonic()
+    failures = []
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    try:
+        while True:
+            await asyncio.sleep(args.sample)
+            elapsed = time.monotonic() - started
+            current, peak = tracemalloc.get_traced_memory()
+            sizes = {name: probe() for name, probe in probes.items()}
+            sample = {
+                "elapsed": round(elapsed, 1), "events": fake.events_sent,
+                "traced_mb": round(current / 2 ** 20, 2), "peak_mb": round(peak / 2 ** 20, 2),
+                "caches": sizes,
+            }
+            print(json.dumps(sample))
+            if report:
+                report.write(json.dumps(sample) + "\n")
+                report.flush()
+
+            for name, size in sizes.items():
+                if name in bounds and size > bounds[name]:
+                    failures.append(f"{name} reached {size} (bound {bounds[name]}) at {elapsed:.0f}s")
+            growth_mb = (current - baseline) / 2 ** 20
+            if args.max_growth_mb is not None and growth_mb > args.max_growth_mb:
+                failures.append(f"traced memory grew {growth_mb:.1f} MB (bound {args.max_growth_mb} MB) at {elapsed:.0f}s")
+            if failures or elapsed >= args.duration or bot_task.done():
+                break
+    finally:
+        if report:
+            report.close()
+        fake.stopping = True
+        # Let in-flight commands finish so close() doesn't strand their coroutines
+        await asyncio.sleep(1)
+        await module.bot.close()
+
+    print("\nTop allocation growth since start:")
+    for stat in tracemalloc.take_snapshot().compare_to(first_snapshot, "lineno")[:10]:
+        print(f"  {stat}")
+    if bot_task.done() and not bot_task.cancelled() and bot_task.exception():
+        failures.append(f"bot stopped: {bot_task.exception()!r}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak a bot against a fake Discord server")
+    parser.add_argument("--bot", default="bot", choices=["bot", "minimal_bot"], help="bot module to run")
+    parser.add_argument("--duration", type=float, default=3600, help="seconds to run")
+    parser.add_argument("--sample", type=float, default=60, help="seconds between samples")
+    parser.add_argument("--rate", type=float, default=5, help="synthetic events per second")
+    parser.add_argument("--users", type=int, default=200, help="synthetic members (in every guild)")
+    parser.add_argument("--guilds", type=int, default=3, help="synthetic guilds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bound", action="append", default=[], metavar="NAME=SIZE", help="override a cache bound")
+    parser.add_argument("--max-growth-mb", type=float, default=None, help="fail if traced memory grows more than this")
+    parser.add_argument("--report", help="write samples as JSON lines to this file")
+    args = parser.parse_args()
+    bounds = parse_bounds(args.bound)
+
+    fake = FakeDiscord(args.users, args.guilds, args.rate, args.seed)
+    fake.start()
+
+    # Keep the soak's CSVs and caches away from a real deployment's
+    tempfile.tempdir = tempfile.mkdtemp(prefix="dotabot-soak-")
+    os.environ["DISCORD_GUILD_ID"] = str(fake.guilds[0][0])
+    os.environ["DOTABOT_OPENDOTA_API"] = f"http://127.0.0.1:{fake.port}/api"
+    # Cards are a no-op without Pillow; with it the renderer and avatar caches get exercised
+    os.environ["DOTABOT_IMAGE_CARDS"] = "1"
+
+    import discord
+    import yarl
+    discord.http.Route.BASE = f"http://127.0.0.1:{fake.port}/api/v10"
+    discord.asset.Asset.BASE = f"http://127.0.0.1:{fake.port}"
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{fake.port}/")
+
+    tracemalloc.start(10)
+    module = importlib.import_module(args.bot)
+    failures = asyncio.run(soak(module, fake, args, bounds))
+
+    if failures:
+        print("\nSOAK FAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nSoak passed.")
+
+if __name__ == "__main__":
+    main()
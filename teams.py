@@ -0,0 +1,83 @@
+import time
+import random
+from itertools import combinations
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TEAM_SIZE = 5
+PLAYERS = TEAM_SIZE * 2
+
+# Every way to pick Radiant from 10 players (252), as bitmasks over player slots
+SPLIT_MASKS = [sum(1 << i for i in team) for team in combinations(range(PLAYERS), TEAM_SIZE)]
+# Same splits as a 252x10 0/1 matrix, so one matrix product scores them all
+SPLIT_MATRIX = (
+    np.array([[(mask >> i) & 1 for i in range(PLAYERS)] for mask in SPLIT_MASKS], dtype=np.int64)
+    if np is not None else None
+)
+SPLIT_MASK_ARRAY = np.array(SPLIT_MASKS, dtype=np.int64) if np is not None else None
+
+def party_masks(parties):
+    """
+    Turns parties (iterables of player slots) into bitmasks, merging parties that share a player.
+    """
+    masks = []
+    for party in parties:
+        mask = sum(1 << i for i in set(party))
+        if mask == 0 or (mask & (mask - 1)) == 0:
+            continue  # a party of one constrains nothing
+        for other in [m for m in masks if m & mask]:
+            masks.remove(other)
+            mask |= other
+        masks.append(mask)
+    return masks
+
+def balance_teams(ratings, parties=()):
+    """
+    Splits 10 players into two teams of 5 with the smallest rating difference,
+    keeping each party on one side. `ratings` is a list of 10 numbers and
+    `parties` an iterable of slot-index groups.
+    Returns (radiant_slots, dire_slots, difference), or None if the parties
+    cannot fit (e.g. a party of six).
+    """
+    if len(ratings) != PLAYERS:
+        raise ValueError(f"need exactly {PLAYERS} ratings, got {len(ratings)}")
+    masks = party_masks(parties)
+    total = sum(ratings)
+
+    if np is not None:
+        radiant = SPLIT_MATRIX @ np.asarray(ratings, dtype=np.int64)
+        diffs = np.abs(total - 2 * radiant)
+        for mask in masks:
+            together = SPLIT_MASK_ARRAY & mask
+            diffs = np.where((together == 0) | (together == mask), diffs, np.iinfo(np.int64).max)
+        best = int(np.argmin(diffs))
+        if diffs[best] == np.iinfo(np.int64).max:
+            return None
+        best_mask, best_diff = SPLIT_MASKS[best], int(diffs[best])
+    else:
+        best_mask, best_diff = None, None
+        for split in SPLIT_MASKS:
+            if any((split & mask) not in (0, mask) for mask in masks):
+                continue
+            radiant = sum(ratings[i] for i in range(PLAYERS) if split >> i & 1)
+            diff = abs(total - 2 * radiant)
+            if best_diff is None or diff < best_diff:
+                best_mask, best_diff = split, diff
+        if best_mask is None:
+            return None
+
+    radiant_slots = [i for i in range(PLAYERS) if best_mask >> i & 1]
+    dire_slots = [i for i in range(PLAYERS) if not best_mask >> i & 1]
+    return radiant_slots, dire_slots, best_diff
+
+if __name__ == "__main__":
+    lobbies = [[random.randint(0, 3000) for _ in range(PLAYERS)] for _ in range(1000)]
+    start = time.perf_counter()
+    for ratings in lobbies:
+        balance_teams(ratings, parties=[(0, 1), (2, 3, 4)])
+    elapsed = (time.perf_counter() - start) * 1000
+    backend = "numpy" if np is not None else "pure python"
+    print(f"{len(lobbies)} lobbies in {elapsed:.1f} ms ({elapsed / len(lobbies) * 1000:.0f} us each, {backend})")
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+
+from discord.ext import commands
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key: `rate` tokens per second up to `burst`.
+    Buckets are kept in least-recently-used order. A bucket that has refilled
+    completely is the same as no bucket, so idle ones are evicted from the
+    old end as we go. Only those are ever evicted: when `max_keys` buckets
+    are all still draining, new keys get no tokens (fail closed) rather
+    than a drained key being forgotten and handed a fresh burst.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, last refill time]
+        self.buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def tokens(self, key, now):
+        """
+        Returns the key's refilled token count and marks it recently used.
+        A new key gets 0 tokens, and no bucket, if the limiter is full.
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self._evict(now)
+            if len(self.buckets) >= self.max_keys:
+                return 0.0
+            bucket = self.buckets[key] = [float(self.burst), now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+            self._evict(now)
+        return bucket[0]
+
+    def take(self, key, amount=1.0):
+        self.buckets[key][0] -= amount
+
+    def _evict(self, now):
+        # Drop fully refilled buckets from the old end, checking at most two
+        # per call so eviction stays O(1)
+        for _ in range(2):
+            if len(self.buckets) <= 1:
+                return
+            key, (tokens, last) = next(iter(self.buckets.items()))
+            if tokens + (now - last) * self.rate < self.burst:
+                return
+            del self.buckets[key]
+
+class CommandThrottle:
+    """
+    Per-user and per-guild token buckets. A command is accepted only if both
+    buckets have a token, and then one token is taken from each.
+    """
+
+    def __init__(self, user_rate, user_burst, guild_rate, guild_burst, max_keys=10000):
+        self.users = TokenBucketLimiter(user_rate, user_burst, max_keys)
+        self.guilds = TokenBucketLimiter(guild_rate, guild_burst, max_keys)
+
+    def allow(self, user_id, guild_id, now=None):
+        if now is None:
+            now = time.monotonic()
+        if self.users.tokens(user_id, now) < 1 or self.guilds.tokens(guild_id, now) < 1:
+            return False
+        self.users.take(user_id)
+        self.guilds.take(guild_id)
+        return True
+
+class Throttled(commands.CheckFailure):
+    """
+    Raised by the `throttled` check when a command is shed.
+    """
+
+def throttled(throttle, counters):
+    """
+    Command check that sheds over-limit invocations before the command body
+    (and any Discord or ledger I/O) runs. Counts go into `counters`.
+    """
+    def predicate(ctx):
+        guild_id = ctx.guild.id if ctx.guild else 0
+        if throttle.allow(ctx.author.id, guild_id):
+            counters["throttle_accepted"] += 1
+            return True
+        counters["throttle_shed"] += 1
+        raise Throttled()
+    return commands.check(predicate)